@@ -0,0 +1,127 @@
+"""Recall@k, memory and query latency of the compressed FAISS index kinds against the flat baseline
+
+Vectors come from the saved SSC index (.voicera_index, built by voicera-ssc.py
+with the default flat index). Without one, the SSC_Syllabus corpus is chunked
+and embedded offline with the stand-in bag-of-words embedding, so texts that
+share words land near each other. The queries are chunks held out of the
+indexed set, so no query is looking for its own vector.
+
+At the syllabus' own size (a few hundred chunks per shard) the app keeps every
+shard flat; use --scale to see how the kinds compare on a larger library.
+
+Usage: python benchmarks/bench_ann.py [--k 4] [--queries 200] [--scale 20] [--json]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.ann import INDEX_KINDS, build_faiss_index, factory_string, index_bytes
+from voicera_core.ingest import iter_chunks
+from voicera_core.pdf_extract import extract_pages
+from voicera_core.standins import StandInEmbeddings
+
+
+def saved_vectors(index_dir):
+    """Vectors of every flat shard saved under index_dir"""
+    vectors = []
+    for path in sorted(glob.glob(os.path.join(index_dir, "shards", "*", "index.faiss"))):
+        index = faiss.read_index(path)
+        if isinstance(index, faiss.IndexFlat):
+            vectors.append(index.reconstruct_n(0, index.ntotal))
+    return np.vstack(vectors) if vectors else None
+
+
+def corpus_vectors(pdf_folder, dim):
+    """Embed the corpus chunks offline with the stand-in embedding"""
+    paths = sorted(os.path.join(pdf_folder, f) for f in os.listdir(pdf_folder) if f.endswith(".pdf"))
+    texts = [chunk for pages in extract_pages(paths) for chunk in iter_chunks(pages)]
+    return np.asarray(StandInEmbeddings(size=dim).embed_documents(texts), dtype=np.float32)
+
+
+def hold_out(vectors, count, seed=1):
+    """Split vectors into (indexed, queries), keeping count of them out of the index"""
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[count:]], vectors[order[:count]]
+
+
+def scale_up(vectors, factor, seed=0):
+    """Simulate a larger library by adding jittered copies of every vector"""
+    if factor <= 1:
+        return vectors
+    rng = np.random.default_rng(seed)
+    spread = vectors.std() * 0.3
+    copies = [vectors] + [vectors + rng.normal(0, spread, vectors.shape).astype(np.float32) for _ in range(factor - 1)]
+    return np.vstack(copies)
+
+
+def measure(kind, vectors, queries, truth, k):
+    start = time.perf_counter()
+    index = build_faiss_index(kind, vectors, min_train_vectors=0)
+    index.add(vectors)
+    build_time = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[0]) & set(expected))
+    latencies = np.array(latencies) * 1000
+    return {
+        "kind": kind,
+        "factory": factory_string(kind, vectors.shape[1], len(vectors)),
+        "vectors": len(vectors),
+        f"recall@{k}": hits / (len(queries) * k),
+        "index_mb": index_bytes(index) / 2 ** 20,
+        "build_s": build_time,
+        "query_ms_mean": float(latencies.mean()),
+        "query_ms_p95": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", default=".voicera_index")
+    parser.add_argument("--pdf-folder", default="SSC_Syllabus")
+    parser.add_argument("--dim", type=int, default=256, help="dimension of the offline embedding")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="chunks held out as queries, at most a fifth of them")
+    parser.add_argument("--scale", type=int, default=1, help="replicate the corpus to simulate a larger library")
+    parser.add_argument("--json", action="store_true", help="print JSON lines instead of a table")
+    args = parser.parse_args()
+
+    vectors = saved_vectors(args.index_dir)
+    source = "saved index"
+    if vectors is None:
+        vectors = corpus_vectors(args.pdf_folder, args.dim)
+        source = "offline embedding"
+    vectors, queries = hold_out(vectors, min(args.queries, len(vectors) // 5))
+    vectors = scale_up(vectors, args.scale)
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+
+    results = [measure(kind, vectors, queries, truth, args.k) for kind in INDEX_KINDS]
+    if args.json:
+        for row in results:
+            print(json.dumps({"source": source, **row}))
+        return
+
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dims from {source}, {len(queries)} held-out queries")
+    print(f"{'kind':<7}{'factory':<20}{'recall@' + str(args.k):>10}{'index MB':>10}{'build s':>9}{'mean ms':>9}{'p95 ms':>9}")
+    for row in results:
+        print(f"{row['kind']:<7}{row['factory']:<20}{row[f'recall@{args.k}']:>10.3f}{row['index_mb']:>10.2f}"
+              f"{row['build_s']:>9.2f}{row['query_ms_mean']:>9.3f}{row['query_ms_p95']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
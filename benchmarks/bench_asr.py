@@ -0,0 +1,137 @@
+"""Compare the latency and word error rate of the ASR engines on recorded questions
+
+Usage: python benchmarks/bench_asr.py [samples_dir] [--engines google,vosk,whisper] [--tts espeak]
+
+samples_dir holds one recording per question (question.wav, or any format
+ffmpeg can decode) next to its reference transcript (question.txt).
+Without it the built-in QUESTIONS are synthesized with a local TTS engine
+(eSpeak NG by default) and used as the samples. Synthetic speech is
+cleaner than a student's recording, so its WER is a lower bound.
+Engines that are not installed or configured on this machine are reported
+and skipped.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.answer_cache import normalize_question
+from voicera_core.asr import ENGINES, decode_audio, get_asr_engine, preprocess, to_audio_data
+from voicera_core.tts import get_tts_engine
+
+QUESTIONS = [
+    "How many marks is the maths paper",
+    "Which chapters are in science part one",
+    "What is the blueprint of the history paper",
+    "Explain the law of gravitation",
+    "What are the grammar topics in English",
+    "How long is the science exam",
+    "Which units are in algebra",
+    "What is the weightage of each unit in geography",
+    "What are the internal assessment marks",
+    "Give me the Hindi question paper format",
+]
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two transcripts"""
+    ref, hyp = normalize_question(reference).split(), normalize_question(hypothesis).split()
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1], len(ref)
+
+
+def generate_samples(samples_dir, tts_engine):
+    """Synthesize QUESTIONS into samples_dir, each recording next to its transcript"""
+    ext = "." + tts_engine.format.split("/")[-1]
+    for i, question in enumerate(QUESTIONS):
+        stem = os.path.join(samples_dir, f"question_{i:02d}")
+        with open(stem + ext, "wb") as f:
+            f.write(tts_engine.synthesize(question))
+        with open(stem + ".txt", "w", encoding="utf-8") as f:
+            f.write(question)
+
+
+def load_samples(samples_dir, trim=True):
+    samples, dropped = [], 0
+    for f in sorted(os.listdir(samples_dir)):
+        stem, ext = os.path.splitext(f)
+        transcript = os.path.join(samples_dir, stem + ".txt")
+        if ext == ".txt" or not os.path.exists(transcript):
+            continue
+        with open(os.path.join(samples_dir, f), "rb") as audio, open(transcript, encoding="utf-8") as text:
+            segment = decode_audio(audio.read())
+            if trim:
+                segment, report = preprocess(segment)
+                dropped += report["dropped_ms"]
+            samples.append((stem, to_audio_data(segment), text.read().strip()))
+    return samples, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples_dir", nargs="?", help="recorded questions, synthesized from QUESTIONS if omitted")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--tts", default="espeak", help="TTS engine that synthesizes the samples without samples_dir")
+    parser.add_argument("--no-trim", action="store_true", help="skip silence trimming and resampling")
+    parser.add_argument("--verbose", action="store_true", help="print every transcript")
+    args = parser.parse_args()
+
+    samples_dir = args.samples_dir
+    if samples_dir is None:
+        try:
+            tts_engine = get_tts_engine(args.tts)
+        except Exception as e:
+            sys.exit(f"Cannot synthesize the sample questions with {args.tts}: {str(e)}. Pass a samples_dir instead.")
+        samples_dir = tempfile.mkdtemp()
+        try:
+            generate_samples(samples_dir, tts_engine)
+            samples, dropped = load_samples(samples_dir, trim=not args.no_trim)
+        finally:
+            shutil.rmtree(samples_dir, ignore_errors=True)
+        print(f"Synthesized {len(QUESTIONS)} sample questions with {args.tts}")
+    else:
+        samples, dropped = load_samples(samples_dir, trim=not args.no_trim)
+    if not samples:
+        sys.exit(f"No recordings with transcripts in {samples_dir}")
+    seconds = sum(len(a.frame_data) / (a.sample_rate * a.sample_width) for _, a, _ in samples)
+    print(f"{len(samples)} recordings, {seconds:.1f}s of audio after trimming {dropped / 1000:.1f}s of silence")
+
+    print(f"{'engine':<10} {'load':>7} {'median':>8} {'p90':>8} {'RTF':>6} {'WER':>6}")
+    for name in args.engines.split(","):
+        start = time.perf_counter()
+        try:
+            engine = get_asr_engine(name)
+        except Exception as e:
+            print(f"{name:<10} skipped: {str(e)}")
+            continue
+        load = time.perf_counter() - start
+
+        times, errors, words = [], 0, 0
+        for stem, audio_data, reference in samples:
+            start = time.perf_counter()
+            try:
+                hypothesis = engine.transcribe(audio_data)
+            except Exception as e:
+                hypothesis = ""
+                print(f"{name:<10} {stem}: {str(e)}")
+            times.append(time.perf_counter() - start)
+            e, n = word_errors(reference, hypothesis)
+            errors, words = errors + e, words + n
+            if args.verbose:
+                print(f"  {stem}: {hypothesis!r} (expected {reference!r})")
+        p90 = sorted(times)[int(0.9 * (len(times) - 1))]
+        print(f"{name:<10} {load:>6.2f}s {statistics.median(times):>7.2f}s {p90:>7.2f}s "
+              f"{sum(times) / seconds:>6.2f} {errors / max(words, 1):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
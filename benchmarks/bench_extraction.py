@@ -0,0 +1,49 @@
+"""Compare serial and process-pool PDF text extraction on the SSC_Syllabus corpus
+
+Usage: python benchmarks/bench_extraction.py [pdf_folder] [--workers N] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.pdf_extract import extract_pages, extract_pages_serial
+
+
+def run(label, fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    pages = sum(len(r) for r in results)
+    chars = sum(len(t) for r in results for t in r)
+    print(f"{label:<10} {pages:>5} pages {chars:>9} chars {best:>8.2f}s {pages / best:>8.1f} pages/s")
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf_folder", nargs="?", default="SSC_Syllabus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.pdf_folder, f) for f in os.listdir(args.pdf_folder) if f.endswith(".pdf"))
+    print(f"{len(paths)} PDFs, {args.workers} workers")
+
+    serial, serial_time = run("serial", lambda: extract_pages_serial(paths), args.repeat)
+    # The first call pays for starting the pool, so warm it before timing
+    extract_pages(paths, max_workers=args.workers)
+    parallel, parallel_time = run("parallel", lambda: extract_pages(paths, max_workers=args.workers), args.repeat)
+
+    if serial != parallel:
+        sys.exit("parallel extraction does not match the serial output")
+    print(f"speedup    {serial_time / parallel_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
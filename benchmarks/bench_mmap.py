@@ -0,0 +1,152 @@
+"""Per-process memory of the syllabus index loaded with and without mmap
+
+Starts several processes that each load the index and answer queries, like
+Streamlit replicas on one host, and reports their RSS and PSS (resident
+memory with shared pages split between the processes that map them).
+
+Uses the saved SSC index (.voicera_index) when there is one. Otherwise an
+index of --scale copies of the --pdf-folder PDFs is built in a temporary
+directory with a deterministic offline embedding.
+
+Usage: python benchmarks/bench_mmap.py [--processes 4] [--scale 10] [--dim 1024] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.syllabus_index import MANIFEST_FILE, read_json
+
+QUERIES = [
+    "How many marks is the Maths paper?",
+    "Which chapters are in Science part one?",
+    "What is the blueprint of the history paper?",
+    "grammar topics in English",
+    "Hindi question paper format",
+]
+
+
+def memory_mb():
+    """RSS and PSS of this process in MB, from /proc (Linux only)"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+
+def worker(pdf_folder, index_dir, settings, dim, use_mmap, barrier, results):
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    from voicera_core.syllabus_index import load_or_build_index
+
+    before = memory_mb()
+    pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
+    docsearch, texts, _ = load_or_build_index(
+        pdf_folder, pdf_files, DeterministicFakeEmbedding(size=dim), settings["embedding_model"],
+        chunk_size=settings["chunk_size"], chunk_overlap=settings["chunk_overlap"],
+        index_kind=settings["index_kind"], index_dir=index_dir, use_mmap=use_mmap
+    )
+    for query in QUERIES:
+        docsearch.similarity_search(query, shards=list(docsearch.shards))
+        docsearch.lexical.search(query)
+    # Measure once every process has loaded, so shared pages are split between all of them
+    barrier.wait()
+    after = memory_mb()
+    results.put({"rss_mb": after["rss"] - before["rss"], "pss_mb": after["pss"] - before["pss"]})
+    barrier.wait()
+
+
+def run(mode, processes, pdf_folder, index_dir, settings, dim):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=worker, args=(pdf_folder, index_dir, settings, dim, mode == "mmap", barrier, results))
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    measured = [results.get() for _ in workers]
+    for p in workers:
+        p.join()
+    rss = [m["rss_mb"] for m in measured]
+    pss = [m["pss_mb"] for m in measured]
+    return {
+        "mode": mode,
+        "processes": processes,
+        "rss_mb_per_process": sum(rss) / len(rss),
+        "pss_mb_per_process": sum(pss) / len(pss),
+        "pss_mb_total": sum(pss),
+    }
+
+
+def build_synthetic(source_folder, scale, dim, workdir):
+    """Index scale copies of the PDFs in source_folder with an offline embedding"""
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    from voicera_core.syllabus_index import load_or_build_index
+
+    pdf_folder = os.path.join(workdir, "pdfs")
+    os.makedirs(pdf_folder)
+    for n in range(scale):
+        for f in os.listdir(source_folder):
+            if f.endswith(".pdf"):
+                shutil.copy(os.path.join(source_folder, f), os.path.join(pdf_folder, f"{n:03d}-{f}"))
+    index_dir = os.path.join(workdir, "index")
+    load_or_build_index(pdf_folder, os.listdir(pdf_folder), DeterministicFakeEmbedding(size=dim),
+                        f"fake/{dim}", index_dir=index_dir)
+    return pdf_folder, index_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--index-dir", default=".voicera_index")
+    parser.add_argument("--pdf-folder", default="SSC_Syllabus")
+    parser.add_argument("--scale", type=int, default=10, help="copies of the corpus for the synthetic index")
+    parser.add_argument("--dim", type=int, default=1024, help="embedding size of the synthetic index")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    workdir = None
+    manifest = read_json(os.path.join(args.index_dir, MANIFEST_FILE))
+    if manifest:
+        pdf_folder, index_dir = args.pdf_folder, args.index_dir
+    else:
+        workdir = tempfile.mkdtemp()
+        start = time.perf_counter()
+        pdf_folder, index_dir = build_synthetic(args.pdf_folder, args.scale, args.dim, workdir)
+        print(f"Built a synthetic index of {args.scale}x the corpus in {time.perf_counter() - start:.0f}s", file=sys.stderr)
+        manifest = read_json(os.path.join(index_dir, MANIFEST_FILE))
+    settings = manifest["settings"]
+    vectors_mb = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(index_dir) for f in files) / 2 ** 20
+    dim = args.dim
+    if not settings["embedding_model"].startswith("fake/"):
+        import faiss
+        shard = next(os.path.join(root, "index.faiss") for root, _, files in os.walk(index_dir) if "index.faiss" in files)
+        dim = faiss.read_index(shard).d
+
+    try:
+        results = [run(mode, args.processes, pdf_folder, index_dir, settings, dim) for mode in ("copy", "mmap")]
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"index_mb": vectors_mb, "results": results}, indent=2))
+        return
+    print(f"Index on disk: {vectors_mb:.1f} MB, {args.processes} processes")
+    print(f"{'mode':<6} {'RSS/process':>12} {'PSS/process':>12} {'PSS total':>10}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['rss_mb_per_process']:>10.1f}MB {r['pss_mb_per_process']:>10.1f}MB {r['pss_mb_total']:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
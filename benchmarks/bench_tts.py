@@ -0,0 +1,71 @@
+"""Compare the latency of the TTS engines on typical answer lengths
+
+Usage: python benchmarks/bench_tts.py [--engines gtts,espeak,piper] [--repeat N]
+
+The audio cache is bypassed so every call synthesizes. Engines that are not
+installed or configured on this machine are reported and skipped.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.tts import ENGINES, get_tts_engine
+
+ANSWERS = {
+    "short": "The Maths paper is worth eighty marks.",
+    "medium": (
+        "The Science and Technology syllabus is split into two parts. Part one covers "
+        "gravitation, periodic classification of elements, chemical reactions, effects "
+        "of electric current, heat and refraction of light. Part two covers heredity, "
+        "life processes, environmental management and towards green energy."
+    ),
+    "long": (
+        "The History and Political Science paper has forty marks for history and twenty "
+        "marks for political science. In history students study historiography, the "
+        "development of Indian historiography, applied history, the history of Indian "
+        "arts, mass media and history, entertainment and history, sports and history, "
+        "tourism and history, and heritage management. Political science covers the "
+        "working of the constitution, the electoral process, political parties, social "
+        "and political movements, and the challenges faced by Indian democracy. Each "
+        "chapter ends with exercises, and the question paper follows the weightage given "
+        "in the blueprint, with objective questions, short answers and long answers. "
+        "Students are expected to read the textbook closely, practise map work and "
+        "timelines, and connect events to their causes and consequences."
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lang", default="en")
+    args = parser.parse_args()
+
+    print(f"{'engine':<22} {'answer':<7} {'words':>5} {'median':>8} {'min':>8} {'max':>8} {'KB':>7}")
+    for name in args.engines.split(","):
+        try:
+            engine = get_tts_engine(name)
+        except Exception as e:
+            print(f"{name:<22} skipped: {str(e)}")
+            continue
+        for label, text in ANSWERS.items():
+            times = []
+            try:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    audio = engine.synthesize(text, args.lang)
+                    times.append(time.perf_counter() - start)
+            except Exception as e:
+                print(f"{engine.name:<22} {label:<7} failed: {str(e)}")
+                break
+            print(f"{engine.name:<22} {label:<7} {len(text.split()):>5} {statistics.median(times):>7.2f}s "
+                  f"{min(times):>7.2f}s {max(times):>7.2f}s {len(audio) / 1024:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Offline benchmark suite: ingestion and query latency on the SSC_Syllabus corpus
+
+Every provider is a local stand-in (voicera_core.standins) with a
+configurable simulated latency, so runs need no network or API keys and
+can be compared between commits. With the default zero latencies the
+numbers are Voicera's own overhead.
+
+Measures PDF extraction throughput, chunking, index build and reload time,
+per-stage and end-to-end query latency (p50/p95/p99, uncached, cached and
+spoken) and the memory of this process.
+
+Usage:
+  python benchmarks/run.py [--output results.json] [--repeat 3] [--embed-latency 0.05] [--asr-latency 0.3] ...
+  python benchmarks/run.py --compare base.json new.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voicera_core.answer_cache import AnswerCache
+from voicera_core.ingest import iter_chunks
+from voicera_core.pdf_extract import extract_pages
+from voicera_core.resources import offline_engine
+from voicera_core.standins import StandInEmbeddings, StandInTTS
+from voicera_core.syllabus_index import load_or_build_index
+from voicera_core.tts import AudioCache
+
+QUERIES = [
+    "How many marks is the Maths paper?",
+    "Which chapters are in Science part one?",
+    "What is the blueprint of the history paper?",
+    "grammar topics in English",
+    "Hindi question paper format",
+    "Gravitation",
+    "What is the weightage of each unit in the Science paper?",
+    "Which topics are covered in geography?",
+    "How long is the Science exam?",
+    "What are the internal assessment marks?",
+    "Which units are in Algebra?",
+    "political science chapters",
+]
+
+
+def memory_mb():
+    """Current and peak resident memory of this process in MB, from /proc (Linux only)"""
+    values = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {"rss_mb": values.get("VmRSS", 0.0), "peak_rss_mb": values.get("VmHWM", 0.0)}
+
+
+def percentiles(name, seconds):
+    """p50/p95/p99 in milliseconds of a list of durations"""
+    ms = np.asarray(seconds) * 1000
+    return {f"{name}.{p}_ms": float(np.percentile(ms, q)) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+
+def best_of(fn, repeat):
+    """(result, fastest seconds) of repeat calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_ingestion(pdf_folder, index_dir, args):
+    pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
+    paths = sorted(os.path.join(pdf_folder, f) for f in pdf_files)
+    size_mb = sum(os.path.getsize(p) for p in paths) / 2 ** 20
+    # The first call pays for starting the process pool
+    extract_pages(paths)
+    pages, extraction = best_of(lambda: extract_pages(paths), args.repeat)
+    page_count = sum(len(p) for p in pages)
+    chars = sum(len(t) for p in pages for t in p)
+
+    chunks, chunking = best_of(lambda: [list(iter_chunks(p)) for p in pages], args.repeat)
+    chunk_count = sum(len(c) for c in chunks)
+
+    embeddings = StandInEmbeddings(latency=args.embed_latency, per_text=args.embed_per_text)
+    start = time.perf_counter()
+    load_or_build_index(pdf_folder, pdf_files, embeddings, embeddings.model, index_dir=index_dir)
+    build = time.perf_counter() - start
+    embed_calls = embeddings.calls
+    _, load = best_of(
+        lambda: load_or_build_index(pdf_folder, pdf_files, embeddings, embeddings.model, index_dir=index_dir),
+        args.repeat
+    )
+    index_mb = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(index_dir) for f in files) / 2 ** 20
+    return {
+        "corpus.files": len(paths),
+        "corpus.pages": page_count,
+        "corpus.mb": size_mb,
+        "extraction.s": extraction,
+        "extraction.pages_per_s": page_count / extraction,
+        "extraction.mb_per_s": size_mb / extraction,
+        "chunking.s": chunking,
+        "chunking.chunks": chunk_count,
+        "chunking.mb_per_s": chars / 2 ** 20 / chunking,
+        "index.build_s": build,
+        "index.chunks_per_s": chunk_count / build,
+        "index.embed_calls": embed_calls,
+        "index.load_s": load,
+        "index.mb": index_mb,
+    }
+
+
+def bench_queries(pdf_folder, index_dir, audio_dir, args):
+    # Synthesized answers go to a cache of their own, not the apps' one
+    engine = offline_engine(
+        pdf_folder, index_dir, embed_latency=args.embed_latency, first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency, tts_latency=args.tts_latency, asr_latency=args.asr_latency,
+        audio_cache=AudioCache(audio_dir)
+    )
+    stages = {"retrieval": [], "first_token": [], "generation": [], "speech": [], "uncached": []}
+    for _ in range(args.repeat):
+        for question in QUERIES:
+            # A fresh answer cache makes every question a miss
+            engine.answer_cache = AnswerCache()
+            first_token = []
+            start = time.perf_counter()
+            docs, _, _, _ = engine.retrieve(question)
+            retrieved = time.perf_counter()
+            answer = engine.generate(question, docs, on_token=lambda token: first_token or first_token.append(time.perf_counter()))
+            generated = time.perf_counter()
+            # Bypass the audio cache so every answer is synthesized
+            engine.tts_engine.synthesize(answer)
+            spoken = time.perf_counter()
+            stages["retrieval"].append(retrieved - start)
+            stages["first_token"].append((first_token[0] if first_token else generated) - retrieved)
+            stages["generation"].append(generated - retrieved)
+            stages["speech"].append(spoken - generated)
+            stages["uncached"].append(spoken - start)
+
+    engine.answer_cache = AnswerCache()
+    for question in QUERIES:
+        engine.answer(question)
+    cached = []
+    for _ in range(args.repeat):
+        for question in QUERIES:
+            start = time.perf_counter()
+            engine.answer(question)
+            cached.append(time.perf_counter() - start)
+
+    # Spoken questions: speech recognition, then an uncached answer without audio
+    recording = StandInTTS().synthesize(QUERIES[0])
+    transcription, voice = [], []
+    for _ in range(args.repeat * len(QUERIES)):
+        engine.answer_cache = AnswerCache()
+        start = time.perf_counter()
+        result = engine.answer_audio(recording, speak=False)
+        voice.append(time.perf_counter() - start)
+        transcription.append(result["metrics"]["stages"]["transcription"])
+
+    results = {"query.count": len(stages["uncached"])}
+    for name, seconds in stages.items():
+        results.update(percentiles(f"query.{name}", seconds))
+    results.update(percentiles("query.cached", cached))
+    results.update(percentiles("query.transcription", transcription))
+    results.update(percentiles("query.voice", voice))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    workdir = tempfile.mkdtemp()
+    try:
+        index_dir = os.path.join(workdir, "index")
+        metrics = bench_ingestion(args.pdf_folder, index_dir, args)
+        metrics.update({f"memory.after_ingestion_{k}": v for k, v in memory_mb().items()})
+        metrics.update(bench_queries(args.pdf_folder, index_dir, os.path.join(workdir, "audio"), args))
+        metrics.update({f"memory.after_queries_{k}": v for k, v in memory_mb().items()})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "metrics": metrics,
+    }
+
+
+def higher_is_better(name):
+    return name.endswith("_per_s")
+
+
+def compare(base_path, new_path, threshold):
+    """Print the change of every metric, returning the names of those that got worse by more than threshold"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{base['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    if base["meta"]["settings"] != new["meta"]["settings"]:
+        print("Warning: the runs used different settings")
+    regressions = []
+    print(f"{'metric':<40} {'base':>12} {'new':>12} {'change':>8}")
+    for name, value in new["metrics"].items():
+        if name not in base["metrics"]:
+            continue
+        old = base["metrics"][name]
+        change = (value - old) / old if old else 0.0
+        worse = -change if higher_is_better(name) else change
+        flag = ""
+        if not name.startswith(("corpus.", "chunking.chunks", "query.count")) and worse > threshold:
+            regressions.append(name)
+            flag = "  regression"
+        print(f"{name:<40} {old:>12.3f} {value:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-folder", default="SSC_Syllabus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated seconds per embedding call")
+    parser.add_argument("--embed-per-text", type=float, default=0.0, help="simulated seconds per embedded text")
+    parser.add_argument("--first-token-latency", type=float, default=0.0, help="simulated seconds to the first LLM token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="simulated seconds between LLM tokens")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="simulated seconds per speech synthesis")
+    parser.add_argument("--asr-latency", type=float, default=0.0, help="simulated seconds per speech recognition")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        return
+
+    results = run(args)
+    for name, value in results["metrics"].items():
+        print(f"{name:<40} {value:>12.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import sys
+import time
+from threading import Lock
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SSC_SYLLABUS = os.path.join(ROOT, "SSC_Syllabus")
+SCIENCE = "Maharashtra SSC Science Syllabus 2025_1747822505829.pdf"
+MATHS = "Maharashtra SSC Maths Syllabus 2025_1747822518962.pdf"
+
+
+@pytest.fixture(scope="session")
+def offline_factory(tmp_path_factory):
+    """get_engine() for an offline engine over two syllabus PDFs, with its own index and caches"""
+    from voicera_core.answer_cache import AnswerCache
+    from voicera_core.resources import offline_engine
+    from voicera_core.tts import AudioCache
+
+    root = tmp_path_factory.mktemp("offline")
+    pdf_folder = root / "pdfs"
+    pdf_folder.mkdir()
+    for pdf in (SCIENCE, MATHS):
+        shutil.copy(os.path.join(SSC_SYLLABUS, pdf), pdf_folder / pdf)
+    answer_cache, audio_cache = AnswerCache(), AudioCache(str(root / "audio"))
+
+    def get_engine():
+        return offline_engine(str(pdf_folder), str(root / "index"), answer_cache=answer_cache, audio_cache=audio_cache)
+    get_engine()
+    return get_engine
+
+
+class Provider(Embeddings):
+    """Records every call and how many run at once; texts in fail raise, the first flaky calls too"""
+
+    def __init__(self, delay=0.0, fail=(), flaky=0):
+        self.delay = delay
+        self.fail = set(fail)
+        self.flaky = flaky
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            flaky, self.flaky = self.flaky > 0, max(0, self.flaky - 1)
+        try:
+            time.sleep(self.delay)
+            if flaky or self.fail & set(texts):
+                raise RuntimeError("provider error")
+            return [[float(len(t))] for t in texts]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
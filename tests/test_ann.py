@@ -0,0 +1,38 @@
+import logging
+
+import faiss
+import numpy as np
+
+from voicera_core.ann import build_faiss_index, make_store
+from voicera_core.standins import StandInEmbeddings
+
+
+def vectors(count, dim=64):
+    return np.random.default_rng(0).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_trained_kinds_fall_back_to_flat_with_a_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="voicera_core.ann"):
+        for kind in ("ivfpq", "pca"):
+            index = build_faiss_index(kind, vectors(200))
+            assert isinstance(index, faiss.IndexFlat)
+    assert len(caplog.records) == 2
+    assert "ivfpq" in caplog.records[0].getMessage()
+
+
+def test_trained_kinds_are_built_with_enough_vectors(caplog):
+    data = vectors(400)
+    with caplog.at_level(logging.WARNING, logger="voicera_core.ann"):
+        ivfpq = build_faiss_index("ivfpq", data, min_train_vectors=len(data))
+        pca = build_faiss_index("pca", data, min_train_vectors=len(data))
+    assert not caplog.records
+    assert isinstance(faiss.downcast_index(ivfpq), faiss.IndexIVFPQ)
+    assert isinstance(pca, faiss.IndexPreTransform)
+
+
+def test_hnsw_store_searches_without_training():
+    embeddings = StandInEmbeddings()
+    texts = ["photosynthesis in green plants", "newton's law of gravitation", "quadratic equations"]
+    store = make_store("hnsw", list(zip(texts, embeddings.embed_documents(texts))), embeddings)
+    assert isinstance(store.index, faiss.IndexHNSW)
+    assert store.similarity_search("law of gravitation", k=1)[0].page_content == texts[1]
@@ -0,0 +1,36 @@
+from langchain_core.documents import Document
+
+from voicera_core.answer_cache import AnswerCache, normalize_question
+
+DOCS = [Document(page_content="Gravitation is the force of attraction between two masses.")]
+
+
+def expire(cache, question):
+    for key, entry in cache._entries.items():
+        if key[1] == normalize_question(question):
+            entry["created"] -= cache.ttl + 1
+
+
+def test_semantic_lookup_skips_an_expired_best_match():
+    cache = AnswerCache(ttl=60, threshold=0.9)
+    cache.put("v1", "What is gravitation?", DOCS, [1.0, 0.0, 0.0], "stale answer")
+    cache.put("v1", "Define gravitation", DOCS, [0.95, 0.2, 0.0], "live answer")
+    expire(cache, "What is gravitation?")
+
+    entry = cache.lookup_semantic("v1", [1.0, 0.0, 0.0])
+    assert entry["answer"] == "live answer"
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 1
+
+
+def test_semantic_lookup_misses_when_only_expired_entries_are_close():
+    cache = AnswerCache(ttl=60, threshold=0.9)
+    cache.put("v1", "What is gravitation?", DOCS, [1.0, 0.0, 0.0], "stale answer")
+    cache.put("v1", "What is photosynthesis?", DOCS, [0.0, 1.0, 0.0], "unrelated answer")
+    expire(cache, "What is gravitation?")
+
+    assert cache.lookup_semantic("v1", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup_semantic("v2", [0.0, 1.0, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 0
@@ -0,0 +1,89 @@
+import asyncio
+import base64
+import threading
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from conftest import MATHS, SCIENCE
+from voicera_core.api import create_app
+from voicera_core.standins import StandInASR, StandInTTS
+
+
+def send(get_engine, method, path, **kwargs):
+    """Make one request to a fresh app, returning (status, JSON or text body)"""
+    async def run():
+        async with TestClient(TestServer(create_app(get_engine, max_workers=2))) as client:
+            response = await client.request(method, path, **kwargs)
+            if response.content_type == "application/json":
+                return response.status, await response.json()
+            return response.status, await response.text()
+    return asyncio.run(run())
+
+
+def test_ask_answers_with_audio(offline_factory):
+    status, body = send(offline_factory, "POST", "/v1/ask", json={"question": "Which chapters are in Science?"})
+    assert status == 200
+    assert body["answer"]
+    assert set(body["sources"]) <= {SCIENCE, MATHS}
+    assert base64.b64decode(body["audio"])[:4] == b"RIFF"
+    assert body["audio_format"] == "audio/wav"
+
+
+def test_ask_without_speech(offline_factory):
+    status, body = send(offline_factory, "POST", "/v1/ask", json={"question": "quadratic equations", "speak": False})
+    assert status == 200
+    assert body["answer"] and body["audio"] is None
+
+
+def test_ask_voice(offline_factory):
+    recording = StandInTTS().synthesize("a recorded question")
+    status, body = send(offline_factory, "POST", "/v1/ask/voice?speak=0", data=recording)
+    assert status == 200
+    assert body["question"] == StandInASR().text
+    assert body["answer"]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"data": "not json"},
+    {"json": [1]},
+    {"json": {"question": ""}},
+    {"json": {"question": 5}},
+    {"json": {"question": "Gravitation", "speak": "false"}},
+])
+def test_ask_rejects_bad_bodies(offline_factory, kwargs):
+    status, _ = send(offline_factory, "POST", "/v1/ask", **kwargs)
+    assert status == 400
+
+
+@pytest.mark.parametrize("data", [b"", b"RIFF\0\0\0\0WAVEnot really audio"])
+def test_ask_voice_rejects_bad_audio(offline_factory, data):
+    status, _ = send(offline_factory, "POST", "/v1/ask/voice", data=data)
+    assert status == 400
+
+
+def test_engine_factory_runs_off_the_event_loop(offline_factory):
+    release = threading.Event()
+
+    def rebuilding_factory():
+        release.wait(5)
+        return offline_factory()
+
+    async def run():
+        async with TestClient(TestServer(create_app(rebuilding_factory, max_workers=2))) as client:
+            start = time.perf_counter()
+            ask = asyncio.ensure_future(client.post("/v1/ask", json={"question": "Gravitation", "speak": False}))
+            await asyncio.sleep(0.2)
+            health = await client.get("/healthz")
+            waited = time.perf_counter() - start
+            release.set()
+            return health.status, waited, (await ask).status
+    health, waited, ask = asyncio.run(run())
+    # /healthz answers while the engine is still being built for /v1/ask
+    assert health == 200 and waited < 2
+    assert ask == 200
+
+
+def test_healthz(offline_factory):
+    assert send(offline_factory, "GET", "/healthz") == (200, {"status": "ok"})
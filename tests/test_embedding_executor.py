@@ -0,0 +1,64 @@
+import time
+from threading import Thread
+
+import pytest
+
+from conftest import Provider
+from voicera_core.embedding_executor import BatchedEmbeddings, EmbeddingBatchError, TokenBucket
+
+
+def batched(provider, **kwargs):
+    return BatchedEmbeddings(provider, tokens_per_minute=None, backoff=0.0, **kwargs)
+
+
+def test_small_call_keeps_every_worker_busy():
+    provider = Provider(delay=0.05)
+    texts = [f"chunk {i}" for i in range(56)]
+    assert batched(provider, batch_size=96, max_concurrency=4).embed_documents(texts) == [[float(len(t))] for t in texts]
+    assert provider.peak == 4
+    assert sorted(len(call) for call in provider.calls) == [14, 14, 14, 14]
+
+
+def test_large_call_is_capped_by_batch_size_and_concurrency():
+    provider = Provider(delay=0.02)
+    batched(provider, batch_size=10, max_concurrency=3).embed_documents([f"chunk {i}" for i in range(95)])
+    assert provider.peak == 3
+    assert max(len(call) for call in provider.calls) <= 10
+
+
+def test_transient_errors_are_retried():
+    provider = Provider(flaky=2)
+    assert batched(provider, max_retries=2).embed_documents(["a", "bb"]) == [[1.0], [2.0]]
+    assert len(provider.calls) == 3
+
+
+def test_partial_failure_keeps_completed_vectors_and_nothing_else():
+    provider = Provider(fail={"bad"})
+    embeddings = batched(provider, batch_size=1, max_concurrency=2, max_retries=1)
+    with pytest.raises(EmbeddingBatchError) as raised:
+        embeddings.embed_documents(["good", "bad", "fine"])
+    assert raised.value.completed == {0: [4.0], 2: [4.0]}
+    assert embeddings._in_flight == {}
+
+
+def test_concurrent_calls_embed_shared_texts_once():
+    provider = Provider(delay=0.1)
+    embeddings = batched(provider, batch_size=8, max_concurrency=2)
+    texts = [f"chunk {i}" for i in range(16)]
+    results = []
+    threads = [Thread(target=lambda: results.append(embeddings.embed_documents(texts))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 3 and results[0] == results[1] == results[2]
+    assert sorted(t for call in provider.calls for t in call) == sorted(texts)
+    assert embeddings._in_flight == {}
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(600, capacity=1)
+    bucket.acquire()
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.08
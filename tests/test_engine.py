@@ -0,0 +1,8 @@
+def test_uncached_question_is_embedded_once(offline_factory):
+    engine = offline_factory()
+    provider = engine.embeddings.embeddings
+    calls = provider.calls
+    result = engine.answer("How do living things adapt to where they live?", speak=False)
+    assert not result["lexical"] and not result["cached"]
+    # One embedding serves both the semantic cache lookup and the vector search
+    assert provider.calls == calls + 1
@@ -0,0 +1,30 @@
+import os
+
+from langchain_text_splitters import CharacterTextSplitter
+
+from conftest import MATHS, SSC_SYLLABUS, Provider
+from voicera_core.embedding_executor import BatchedEmbeddings
+from voicera_core.ingest import embed_batch_size, index_chunks, iter_chunks
+from voicera_core.pdf_extract import extract_pages, join_pages
+
+
+def split(pages, chunk_size, chunk_overlap):
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    return splitter.split_text(join_pages(pages))
+
+
+def test_streamed_chunks_match_the_splitter():
+    pages = extract_pages([os.path.join(SSC_SYLLABUS, MATHS)])[0]
+    assert list(iter_chunks(pages)) == split(pages, 1000, 200)
+    pages = ["short line\n" * 7, "", "a much longer line that has to be split on its own\n" * 3, "tail"]
+    assert list(iter_chunks(pages, chunk_size=40, chunk_overlap=15)) == split(pages, 40, 15)
+
+
+def test_ingestion_keeps_every_embedding_worker_busy():
+    provider = Provider(delay=0.02)
+    embeddings = BatchedEmbeddings(provider, batch_size=20, max_concurrency=4, tokens_per_minute=None)
+    assert embed_batch_size(embeddings) == 80
+    _, count = index_chunks((f"chunk {i}" for i in range(400)), embeddings)
+    assert count == 400
+    assert provider.peak == 4
+    assert {len(call) for call in provider.calls} == {20}
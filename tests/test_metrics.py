@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from conftest import Provider
+
+from voicera_core.api import ENGINE, EXECUTOR, _run
+from voicera_core.embedding_executor import BatchedEmbeddings
+from voicera_core.metrics import InstrumentedEmbeddings, activated, span
+from voicera_core.standins import StandInTTS
+from voicera_core.timing import StageTimer
+from voicera_core.tts import AudioCache, submit_speech
+
+
+def test_embedding_batches_record_in_the_callers_timer():
+    embeddings = BatchedEmbeddings(InstrumentedEmbeddings(Provider(delay=0.01), "test"), batch_size=8, max_concurrency=4)
+    timer = StageTimer()
+    with activated(timer):
+        embeddings.embed_documents([f"chunk {i}" for i in range(32)])
+    assert timer.counts["provider_calls embed/test"] == 4
+    assert timer.counts["embedded_chunks test"] == 32
+    assert timer.spans["embed"] > 0
+
+
+def test_speech_worker_records_in_the_callers_timer(tmp_path):
+    timer = StageTimer()
+    with activated(timer):
+        submit_speech("The answer read aloud.", engine=StandInTTS(), cache=AudioCache(str(tmp_path))).result()
+    assert timer.counts["provider_calls tts/standin"] == 1
+    assert timer.counts["cache_misses audio"] == 1
+    assert "tts" in timer.spans
+
+
+def test_api_calls_record_in_the_handlers_timer():
+    class Engine:
+        def work(self):
+            with span("work"):
+                return threading.current_thread()
+
+    timer = StageTimer()
+
+    async def handler(request):
+        with activated(timer):
+            return await _run(request, "work")
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        request = SimpleNamespace(app={EXECUTOR: pool, ENGINE: Engine})
+        worker = asyncio.run(handler(request))
+    assert worker is not threading.current_thread()
+    assert "work" in timer.spans
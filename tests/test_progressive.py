@@ -0,0 +1,38 @@
+import os
+import time
+
+from conftest import SCIENCE, SSC_SYLLABUS
+from voicera_core.ingest import iter_chunks
+from voicera_core.pdf_extract import extract_pages
+from voicera_core.progressive import ProgressiveIndexer
+from voicera_core.standins import StandInEmbeddings
+
+
+def indexed_texts(indexer):
+    return [doc.page_content for doc in indexer.index.documents()]
+
+
+def test_background_pass_continues_the_first_pages_chunks():
+    path = os.path.join(SSC_SYLLABUS, SCIENCE)
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    indexer = ProgressiveIndexer(file_bytes, SCIENCE, StandInEmbeddings(), first_pages=2)
+    # The first pages are searchable right away, their last chunk provisionally
+    assert indexed_texts(indexer)
+    deadline = time.monotonic() + 60
+    while not indexer.done and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert indexer.done and indexer.error is None
+
+    expected = list(iter_chunks(extract_pages([path])[0]))
+    assert indexed_texts(indexer) == expected
+    assert indexer.sections == len(expected)
+
+
+def test_short_document_is_indexed_in_one_pass():
+    path = os.path.join(SSC_SYLLABUS, SCIENCE)
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    indexer = ProgressiveIndexer(file_bytes, SCIENCE, StandInEmbeddings(), first_pages=1000)
+    assert indexer.done
+    assert indexed_texts(indexer) == list(iter_chunks(extract_pages([path])[0]))
@@ -0,0 +1,31 @@
+from voicera_core.shards import ShardRouter, name_words
+
+BLUEPRINT = "SSC_SUB_98_X8_X2_BLUE_PRINT_AND_SYLLABUS_d4dfab13af.pdf"
+SCIENCE = "Maharashtra SSC Science Syllabus 2025_1747822505829.pdf"
+MATHS = "Maharashtra SSC Maths Syllabus 2025_1747822518962.pdf"
+HINDI = "Maharashtra SSC Hindi Syllabus 2025_1747822498118.pdf"
+
+
+def router():
+    return ShardRouter({
+        BLUEPRINT: ["Marks distribution and question paper pattern for each subject"],
+        SCIENCE: ["Photosynthesis in plants", "Cellular respiration and energy", "Gravitation and motion"],
+        MATHS: ["Linear equations in two variables", "Quadratic equations", "Probability"],
+        HINDI: ["Vyakaran and rachana"],
+    })
+
+
+def test_name_words_drop_stop_words_and_hashes():
+    assert name_words(BLUEPRINT) == {"blue", "print"}
+    assert name_words(MATHS) == {"maths"}
+
+
+def test_subject_name_routes_to_its_shard():
+    assert router().route("How many marks is the mathematics paper?") == [MATHS]
+    assert router().route("Show me the blueprint") == [BLUEPRINT]
+
+
+def test_stop_words_fall_back_to_tfidf():
+    # "and" is in the blueprint file name but must not route there
+    assert router().route("Explain photosynthesis and respiration") == [SCIENCE]
+    assert router().route("quadratic and linear equations") == [MATHS]
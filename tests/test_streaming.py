@@ -0,0 +1,20 @@
+from langchain.chains.question_answering import load_qa_chain
+from langchain_core.documents import Document
+
+from voicera_core.standins import StandInChatModel
+from voicera_core.streaming import stream_answer
+
+DOCS = [
+    Document(page_content="Gravitation is the force of attraction between any two masses in the universe."),
+    Document(page_content="Photosynthesis is the process by which green plants make food from sunlight."),
+]
+
+
+def test_streamed_answer_matches_the_blocking_chain_on_the_same_model():
+    llm = StandInChatModel()
+    question = "What is gravitation?"
+    tokens = list(stream_answer(llm, DOCS, question))
+    blocking = load_qa_chain(llm, chain_type="stuff").invoke({"input_documents": DOCS, "question": question})
+    assert len(tokens) > 1
+    assert "".join(tokens) == blocking["output_text"]
+    assert "".join(tokens).startswith("Gravitation is the force")
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+import shutil
+
+from conftest import MATHS as PDF, SSC_SYLLABUS, Provider
+from voicera_core.embedding_executor import BatchedEmbeddings
+from voicera_core.standins import StandInEmbeddings
+from voicera_core.syllabus_index import load_or_build_index
+
+
+def build(pdf_folder, index_dir):
+    embeddings = StandInEmbeddings()
+    _, texts, changes = load_or_build_index(pdf_folder, [PDF], embeddings, embeddings.model, index_dir=index_dir)
+    return len(texts), changes["added"]
+
+
+def test_replicas_build_a_fresh_index_once(tmp_path):
+    pdf_folder = tmp_path / "pdfs"
+    pdf_folder.mkdir()
+    shutil.copy(os.path.join(SSC_SYLLABUS, PDF), pdf_folder / PDF)
+    index_dir = str(tmp_path / "index")
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        results = pool.starmap(build, [(str(pdf_folder), index_dir)] * 4)
+
+    # Every replica loads the same index, and only the first one embedded it
+    assert len({count for count, _ in results}) == 1
+    assert sorted(len(added) for _, added in results) == [0, 0, 0, 1]
+    assert not [f for f in os.listdir(os.path.join(index_dir, "shards")) if f.endswith(".tmp")]
+
+
+def test_syllabus_build_keeps_every_embedding_worker_busy(tmp_path):
+    provider = Provider(delay=0.05)
+    embeddings = BatchedEmbeddings(provider, tokens_per_minute=None)
+    pdf_files = sorted(f for f in os.listdir(SSC_SYLLABUS) if f.endswith(".pdf"))
+    _, texts, _ = load_or_build_index(SSC_SYLLABUS, pdf_files, embeddings, "provider", index_dir=str(tmp_path))
+    # The two identical English PDFs share their chunks, which are embedded once
+    assert sum(len(call) for call in provider.calls) == len(set(texts))
+    assert provider.peak == embeddings.max_concurrency
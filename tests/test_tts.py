@@ -0,0 +1,24 @@
+import os
+
+from voicera_core.tts import AudioCache
+
+
+def test_processes_sharing_a_cache_dir_keep_it_bounded(tmp_path):
+    # Two caches on one directory, as the three apps' processes have
+    first, second = AudioCache(str(tmp_path), max_bytes=3000), AudioCache(str(tmp_path), max_bytes=3000)
+    for i in range(10):
+        (first if i % 2 else second).put(AudioCache.key(f"answer {i}", "standin", "en"), b"\0" * 1000)
+    sizes = [os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)]
+    assert sum(sizes) <= 3000
+    assert first.stats()["bytes"] == second.stats()["bytes"] == sum(sizes)
+    # The newest answer survives eviction
+    assert first.get(AudioCache.key("answer 9", "standin", "en")) == b"\0" * 1000
+
+
+def test_missing_files_are_tolerated(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1500)
+    cache.put("a", b"\0" * 1000)
+    os.remove(tmp_path / "a")
+    cache.put("b", b"\0" * 1000)
+    cache.put("c", b"\0" * 1000)
+    assert os.listdir(tmp_path) == ["c"]
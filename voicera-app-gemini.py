@@ -1,23 +1,29 @@
 import streamlit as st
-import tempfile
-import os
-import speech_recognition as sr
-from gtts import gTTS
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from pydub import AudioSegment
 from datetime import datetime
 import base64
 import uuid
 import google.generativeai as genai
-from io import BytesIO
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import get_asr_engine, transcribe
+from voicera_core.context import MAX_CONTEXT_TOKENS, pack_context
+from voicera_core.hybrid import BM25Index, HybridRetriever
+from voicera_core.metrics import debug_panel, request_record, write_jsonl
+from voicera_core.pdf_extract import join_pages
+from voicera_core.progressive import ProgressiveIndexer
+from voicera_core.resources import gemini_clients
+from voicera_core.singleflight import question_key, shared_single_flight
+from voicera_core.streaming import stream_answer
+from voicera_core.timing import StageTimer
+from voicera_core.tts import get_tts_engine, submit_speech
 
 # Load Gemini API key
 genai.configure(api_key=st.secrets["gemini_api_key"])
 
+# Speech engine for this deployment: "gtts" (default), "espeak" or "piper"
+tts_engine = get_tts_engine(st.secrets.get("tts_engine"))
+# Speech recognizer: "google" (default), "vosk" or "whisper", loaded once per process
+asr_engine = get_asr_engine(st.secrets.get("asr_engine"))
+
 # Set page config
 st.set_page_config(
     page_title="Voicera - Conversational AI for Education",
@@ -89,50 +95,32 @@ st.markdown("""
 # Cache document processing
 @st.cache_resource(show_spinner="Processing document, please wait...")
 def process_document(file_bytes, file_name):
-    """Process PDF document and return text chunks and vector store"""
+    """Index the first pages of the PDF and keep indexing the rest in the background"""
     try:
-        reader = PdfReader(BytesIO(file_bytes))
-        doc_text = ""
-        max_pages = 20
-        
-        for i, page in enumerate(reader.pages):
-            if i >= max_pages:
-                break
-            text = page.extract_text()
-            if text:
-                doc_text += text.strip() + "\n"
+        first_pages = 20
+        embeddings = gemini_clients(st.secrets["gemini_api_key"]).embeddings
 
-        if not doc_text.strip():
+        indexer = ProgressiveIndexer(file_bytes, file_name, embeddings, first_pages=first_pages)
+        if indexer.done and not indexer.doc_text.strip():
             raise ValueError("No text could be extracted from the PDF")
-
-        splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
-        texts = splitter.split_text(doc_text)
-
-        if not texts:
-            raise ValueError("No text chunks created from the document")
-
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=st.secrets["gemini_api_key"]
-        )
-        docsearch = FAISS.from_texts(texts, embeddings)
-
-        return doc_text, texts, docsearch
+        return indexer
     except Exception as e:
         st.error(f"Error processing document: {str(e)}")
-        return None, None, None
+        return None
 
-def cleanup_temp_files(*paths):
-    """Safely cleanup temporary files and directories"""
-    for path in paths:
-        try:
-            if os.path.exists(path):
-                if os.path.isfile(path):
-                    os.remove(path)
-                elif os.path.isdir(path):
-                    os.rmdir(path)
-        except Exception as e:
-            st.warning(f"Could not cleanup {path}: {str(e)}")
+def document_details(indexer, live):
+    """Show section count, indexing progress and a content preview"""
+    st.write(f"**Sections:** {indexer.sections}")
+    if indexer.error:
+        st.warning(f"Background indexing stopped: {str(indexer.error)}")
+    elif not indexer.done:
+        st.progress(indexer.progress, text=f"Indexing page {indexer.pages_done} of {indexer.total_pages} in the background...")
+    preview = join_pages(indexer.pages[:5])
+    st.markdown("**Content Preview:**")
+    st.markdown(f'<div class="document-content">{preview[:1000]}{"..." if len(preview) > 1000 else ""}</div>', unsafe_allow_html=True)
+    # Once background indexing finishes, rerun the page so the refresh timer stops
+    if live and indexer.done:
+        st.rerun()
 
 # App Header
 st.title("🤖 Voicera - Conversational AI for Education")
@@ -147,10 +135,8 @@ if "audio_responses" not in st.session_state:
     st.session_state.audio_responses = {}
 if "docsearch" not in st.session_state:
     st.session_state.docsearch = None
-if "doc_text" not in st.session_state:
-    st.session_state.doc_text = ""
-if "texts" not in st.session_state:
-    st.session_state.texts = []
+if "indexer" not in st.session_state:
+    st.session_state.indexer = None
 if "current_file_name" not in st.session_state:
     st.session_state.current_file_name = None
 
@@ -164,16 +150,18 @@ if uploaded_file:
     if st.session_state.current_file_name != uploaded_file.name:
         file_bytes = uploaded_file.read()
         with st.spinner("Processing document..."):
-            doc_text, texts, docsearch = process_document(file_bytes, uploaded_file.name)
+            indexer = process_document(file_bytes, uploaded_file.name)
             
-            if doc_text and texts and docsearch:
+            if indexer:
                 # Store in session state
-                st.session_state.doc_text = doc_text
-                st.session_state.texts = texts
-                st.session_state.docsearch = docsearch
+                st.session_state.indexer = indexer
+                st.session_state.docsearch = indexer.index
                 st.session_state.document_processed = True
                 st.session_state.current_file_name = uploaded_file.name
-                st.success(f"Document processed successfully! ({len(texts)} sections)")
+                if indexer.done:
+                    st.success(f"Document processed successfully! ({indexer.sections} sections)")
+                else:
+                    st.success(f"First {indexer.first_pages} pages ready ({indexer.sections} sections). You can start asking while the rest is indexed.")
             else:
                 st.error("Failed to process the document. Please try again.")
                 st.session_state.document_processed = False
@@ -185,8 +173,7 @@ else:
     if st.session_state.current_file_name:
         st.session_state.document_processed = False
         st.session_state.docsearch = None
-        st.session_state.doc_text = ""
-        st.session_state.texts = []
+        st.session_state.indexer = None
         st.session_state.current_file_name = None
 
 # Sidebar tools
@@ -195,21 +182,28 @@ with st.sidebar:
     if st.session_state.document_processed and uploaded_file:
         st.write(f"**Name:** {uploaded_file.name}")
         st.write(f"**Size:** {uploaded_file.size / 1024:.1f} KB")
-        st.write(f"**Sections:** {len(st.session_state.texts)}")
-        st.markdown("**Content Preview:**")
-        st.markdown(f'<div class="document-content">{st.session_state.doc_text[:1000]}{"..." if len(st.session_state.doc_text) > 1000 else ""}</div>', unsafe_allow_html=True)
-        st.download_button("📥 Download Text", st.session_state.doc_text, f"{uploaded_file.name}_content.txt")
+        indexer = st.session_state.indexer
+        if indexer.done:
+            document_details(indexer, live=False)
+            st.download_button("📥 Download Text", indexer.doc_text, f"{uploaded_file.name}_content.txt")
+        else:
+            # Refresh only this panel while pages are indexed, without blocking the chat
+            st.fragment(run_every=1)(document_details)(indexer, live=True)
         
         if st.button("🗑️ Clear Document"):
             st.session_state.document_processed = False
             st.session_state.docsearch = None
-            st.session_state.doc_text = ""
-            st.session_state.texts = []
+            st.session_state.indexer = None
             st.session_state.current_file_name = None
             st.success("Document cleared!")
             st.rerun()
     else:
         st.info("Upload a document to enable tools")
+    stream_answers = st.checkbox("Stream answers as they are generated", value=True)
+    show_debug = st.checkbox("Show debug metrics", value=st.secrets.get("debug_panel", False))
+
+# Times and counts everything done for this question, in this thread and the speech worker
+timer = StageTimer().activate()
 
 # Initialize query variables outside the expander
 query = ""
@@ -223,35 +217,16 @@ with st.expander("💬 Ask Your Question", expanded=st.session_state.document_pr
         # Voice input
         audio_bytes = st.audio_input("🎤 Speak your question:")
         if audio_bytes:
-            temp_dir = None
-            webm_path = None
-            wav_path = None
             try:
-                temp_dir = tempfile.mkdtemp()
-                webm_path = os.path.join(temp_dir, "input.webm")
-                wav_path = os.path.join(temp_dir, "input.wav")
-                
-                # Save audio file
-                with open(webm_path, "wb") as f:
-                    f.write(audio_bytes.getvalue())
-                
-                # Convert to WAV
-                audio = AudioSegment.from_file(webm_path)
-                audio.export(wav_path, format="wav")
-                
-                # Speech recognition
-                recognizer = sr.Recognizer()
-                with sr.AudioFile(wav_path) as source:
-                    audio_data = recognizer.record(source)
-                query = recognizer.recognize_google(audio_data)
+                with timer.stage("transcription"):
+                    query, trimmed = transcribe(audio_bytes.getvalue(), engine=asr_engine)
+                st.caption(f"Recognized {trimmed['kept_ms'] / 1000:.1f}s of speech, trimmed {trimmed['dropped_ms'] / 1000:.1f}s of silence")
                 
                 if query:
                     st.success(f"Recognized: {query}")
                 
             except Exception as e:
                 st.error(f"Speech recognition failed: {str(e)}")
-            finally:
-                cleanup_temp_files(webm_path, wav_path, temp_dir)
 
         # Text input
         text_query = st.text_input("💬 Or type your question:", value=query if query else "")
@@ -262,6 +237,8 @@ if "processing_query" not in st.session_state:
     st.session_state.processing_query = False
 
 # Process and answer the query
+speech = None
+answered = None
 if final_query and st.session_state.document_processed and st.session_state.docsearch and not st.session_state.processing_query:
     # Check if this is a new query
     last_user_msg = None
@@ -282,16 +259,58 @@ if final_query and st.session_state.document_processed and st.session_state.docs
         })
         
         with st.spinner("🤔 Analyzing your question..."):
-            temp_dir = None
-            audio_path = None
             try:
-                # Get answer from document
-                llm = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
-                chain = load_qa_chain(llm, chain_type="stuff")
-                docs = st.session_state.docsearch.similarity_search(final_query, k=3)
-                result = chain.invoke({"input_documents": docs, "question": final_query})
-                answer = result.get("output_text", "I couldn't find a good answer in the document.")
-                
+                answer_cache = shared_answer_cache()
+                cache_namespace = st.session_state.indexer.version
+                # Rebuild the lexical index whenever background indexing has added sections
+                if st.session_state.get("lexical_version") != cache_namespace:
+                    st.session_state.lexical = BM25Index(st.session_state.docsearch.documents())
+                    st.session_state.lexical_version = cache_namespace
+                retriever = HybridRetriever(st.session_state.docsearch, st.session_state.lexical,
+                                            fast_path=st.secrets.get("lexical_fast_path", True))
+
+                def answer_question():
+                    """Retrieve and answer the question, returning what the rest of the page needs"""
+                    with timer.stage("retrieval"):
+                        # Unambiguous keyword lookups skip embedding the question
+                        docs = retriever.fast_path(final_query, k=3)
+                        query_vector, cached = None, None
+                        if docs is None:
+                            # Reuse a cached answer for the same or a near-identical question
+                            query_vector = st.session_state.docsearch.embeddings.embed_query(final_query)
+                            cached = answer_cache.lookup_semantic(cache_namespace, query_vector)
+                            if cached is None:
+                                docs = retriever.search(final_query, k=3, query_vector=query_vector)
+                        if cached is None:
+                            cached = answer_cache.lookup_exact(cache_namespace, final_query, docs)
+                    flight = {"docs": docs, "query_vector": query_vector, "cached": bool(cached)}
+                    if cached:
+                        return {**flight, "answer": cached["answer"], "audio": cached["audio"]}
+
+                    # Merge overlapping chunks and fill the prompt up to the token budget
+                    context_docs, _ = pack_context(docs, max_tokens=st.secrets.get("context_tokens", MAX_CONTEXT_TOKENS))
+                    # Get answer from document
+                    clients = gemini_clients(st.secrets["gemini_api_key"])
+                    if stream_answers:
+                        # Render tokens into the bot bubble as they arrive
+                        bubble = st.empty()
+                        parts = []
+                        with timer.stage("answer"):
+                            for token in stream_answer(clients.llm, context_docs, final_query):
+                                parts.append(token)
+                                bubble.markdown(f"<div class='chat-bubble bot-bubble'>🤖 {''.join(parts)}▌</div>", unsafe_allow_html=True)
+                        bubble.empty()
+                        answer = "".join(parts) or "I couldn't find a good answer in the document."
+                    else:
+                        with timer.stage("answer"):
+                            result = clients.chain.invoke({"input_documents": context_docs, "question": final_query})
+                        answer = result.get("output_text", "I couldn't find a good answer in the document.")
+                    return {**flight, "answer": answer, "audio": None}
+
+                # Sessions asking the same question about the same document share one embedding, LLM and TTS run
+                flight, shared = shared_single_flight("answer").do(question_key(cache_namespace, final_query), answer_question)
+                cached, answer = flight["cached"], flight["answer"]
+
                 # Add bot response to chat
                 st.session_state.chat_history.append({
                     "type": "bot", 
@@ -299,19 +318,25 @@ if final_query and st.session_state.document_processed and st.session_state.docs
                     "timestamp": datetime.now().strftime("%H:%M")
                 })
 
-                # Generate TTS audio
                 response_id = str(uuid.uuid4())
-                tts = gTTS(text=answer, lang='en')
-                temp_dir = tempfile.mkdtemp()
-                audio_path = os.path.join(temp_dir, f"response_{response_id}.mp3")
-                tts.save(audio_path)
-
-                # Store audio in session state
-                with open(audio_path, "rb") as audio_file:
-                    st.session_state.audio_responses[response_id] = audio_file.read()
-
-                # Display success message
-                st.success("✅ Response generated! Check the chat history below.")
+                if flight["audio"] is not None:
+                    st.session_state.audio_responses[response_id] = flight["audio"]
+                else:
+                    # Show the text now and attach the audio in the chat history once the worker has it
+                    speech = submit_speech(answer, lang="en", engine=tts_engine, timer=timer)
+                    if not cached and not shared:
+                        speech.add_done_callback(lambda done: done.exception() or answer_cache.put(
+                            cache_namespace, final_query, flight["docs"], flight["query_vector"], answer, done.result()
+                        ))
+                timer.mark("text")
+                answered = {"cached": flight["cached"], "shared": shared}
+                if shared:
+                    st.success("🤝 Answered together with others asking the same question! Check the chat history below.")
+                elif cached:
+                    st.success("⚡ Answered from cache! Check the chat history below.")
+                else:
+                    # Display success message
+                    st.success("✅ Response generated! Check the chat history below.")
 
             except Exception as e:
                 st.error(f"Error generating response: {str(e)}")
@@ -321,7 +346,6 @@ if final_query and st.session_state.document_processed and st.session_state.docs
                     "timestamp": datetime.now().strftime("%H:%M")
                 })
             finally:
-                cleanup_temp_files(audio_path, temp_dir)
                 st.session_state.processing_query = False
 
 # Chat History Display
@@ -341,10 +365,13 @@ else:
         """, unsafe_allow_html=True)
         
         # Show audio player for the most recent bot response
-        if (msg['type'] == 'bot' and i == len(st.session_state.chat_history) - 1 
+        if msg['type'] == 'bot' and i == len(st.session_state.chat_history) - 1 and speech is not None:
+            audio_slot = st.empty()
+            audio_slot.caption("🔊 Preparing audio...")
+        elif (msg['type'] == 'bot' and i == len(st.session_state.chat_history) - 1 
             and st.session_state.audio_responses):
             latest_audio = list(st.session_state.audio_responses.values())[-1]
-            st.audio(latest_audio, format="audio/mp3")
+            st.audio(latest_audio, format=tts_engine.format)
 
 # Chat management buttons
 col1, col2 = st.columns(2)
@@ -368,4 +395,23 @@ with col2:
 
 # Footer
 st.markdown("---")
-st.markdown("*Voicera uses Google's Gemini AI and text-to-speech to provide interactive learning experiences.*")
\ No newline at end of file
+st.markdown("*Voicera uses Google's Gemini AI and text-to-speech to provide interactive learning experiences.*")
+
+# Attach the spoken answer once the worker has synthesized it
+if speech is not None:
+    try:
+        st.session_state.audio_responses[response_id] = speech.result()
+        timer.mark("audio")
+        with audio_slot.container():
+            st.audio(st.session_state.audio_responses[response_id], format=tts_engine.format)
+            st.caption(f"⏱️ {timer.summary()}")
+        timer.log()
+    except Exception as e:
+        audio_slot.error(f"Speech synthesis failed: {str(e)}")
+
+# Timings and counts of this question, for the metrics log and the debug panel
+if answered is not None:
+    write_jsonl(request_record(timer, app="gemini", **answered), st.secrets.get("metrics_jsonl"))
+if show_debug:
+    with st.sidebar:
+        debug_panel(timer)
@@ -1,23 +1,30 @@
 import streamlit as st
-import tempfile
-import os
-import speech_recognition as sr
-from gtts import gTTS
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_cohere import CohereEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import Cohere
-from langchain.chains.question_answering import load_qa_chain
-from pydub import AudioSegment
 from datetime import datetime
 import streamlit.components.v1 as components
 import base64
 import uuid
+import hashlib
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import get_asr_engine, transcribe
+from voicera_core.context import MAX_CONTEXT_TOKENS, pack_context
+from voicera_core.hybrid import BM25Index, HybridRetriever
+from voicera_core.ingest import ingest_files
+from voicera_core.metrics import debug_panel, request_record, write_jsonl
+from voicera_core.pdf_extract import join_pages
+from voicera_core.resources import cohere_clients
+from voicera_core.singleflight import question_key, shared_single_flight
+from voicera_core.streaming import stream_answer
+from voicera_core.timing import StageTimer
+from voicera_core.tts import get_tts_engine, submit_speech
 
 # Load Cohere API key
 cohere_api_key = st.secrets["cohere_api_key"]
 
+# Speech engine for this deployment: "gtts" (default), "espeak" or "piper"
+tts_engine = get_tts_engine(st.secrets.get("tts_engine"))
+# Speech recognizer: "google" (default), "vosk" or "whisper", loaded once per process
+asr_engine = get_asr_engine(st.secrets.get("asr_engine"))
+
 # Set page config
 st.set_page_config(
     page_title="Voicera - Conversational AI for Education",
@@ -106,21 +113,29 @@ with st.expander("📄 Upload Learning Materials"):
 if uploaded_file:
     with st.spinner("Processing document..."):
         try:
-            doc_text = ""
-            reader = PdfReader(uploaded_file)
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    doc_text += text.strip() + "\n"
-
-            splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
-            texts = splitter.split_text(doc_text)
-            embeddings = CohereEmbeddings(cohere_api_key=cohere_api_key, model="embed-english-v3.0")
-            docsearch = FAISS.from_texts(texts, embeddings)
-            llm = Cohere(cohere_api_key=cohere_api_key, temperature=0.3)
-            chain = load_qa_chain(llm, chain_type="stuff")
+            # Model clients are built once per server process and shared by every session
+            clients = cohere_clients(cohere_api_key)
+            embeddings, chain, chat_llm = clients.embeddings, clients.chain, clients.chat_llm
+            doc_id = hashlib.sha256(uploaded_file.getvalue()).hexdigest()[:16]
+            # Index an upload once per session rather than on every rerun
+            if st.session_state.get("doc_id") != doc_id:
+                # Pages are chunked and embedded as they are extracted; only the page texts are kept for the preview
+                pages = []
+                docsearch, counts = ingest_files(
+                    [uploaded_file.getvalue()], embeddings, names=[uploaded_file.name],
+                    on_page=lambda i, text: pages.append(text)
+                )
+                if docsearch is None:
+                    raise ValueError("No text could be extracted from the PDF")
+                st.session_state.retriever = HybridRetriever(
+                    docsearch, BM25Index.from_store(docsearch), fast_path=st.secrets.get("lexical_fast_path", True)
+                )
+                st.session_state.doc_text = join_pages(pages)
+                st.session_state.sections = counts[uploaded_file.name]
+                st.session_state.doc_id = doc_id
+            retriever, doc_text, sections = st.session_state.retriever, st.session_state.doc_text, st.session_state.sections
             st.session_state.document_processed = True
-            st.success(f"Document processed ({len(texts)} sections)")
+            st.success(f"Document processed ({sections} sections)")
         except Exception as e:
             st.error(f"Failed to process: {str(e)}")
 
@@ -130,12 +145,17 @@ with st.sidebar:
     if uploaded_file:
         st.write(f"**Name:** {uploaded_file.name}")
         st.write(f"**Size:** {uploaded_file.size/1024:.1f} KB")
-        st.write(f"**Sections:** {len(texts) if 'texts' in locals() else 0}")
+        st.write(f"**Sections:** {sections if 'sections' in locals() else 0}")
         st.markdown("**Content Preview:**")
         st.markdown(f'<div class="document-content">{doc_text}</div>', unsafe_allow_html=True)
         st.download_button("📅 Download Text", doc_text, f"{uploaded_file.name}_content.txt")
     else:
         st.info("Upload a document to enable tools")
+    stream_answers = st.checkbox("Stream answers as they are generated", value=True)
+    show_debug = st.checkbox("Show debug metrics", value=st.secrets.get("debug_panel", False))
+
+# Times and counts everything done for this question, in this thread and the speech worker
+timer = StageTimer().activate()
 
 # Input (Collapsing section)
 with st.expander("💬 Ask Your Question"):
@@ -145,21 +165,10 @@ with st.expander("💬 Ask Your Question"):
     audio_bytes = st.audio_input("Speak your question:")
     if audio_bytes:
         try:
-            temp_dir = tempfile.mkdtemp()
-            webm_path = os.path.join(temp_dir, "input.webm")
-            with open(webm_path, "wb") as f:
-                f.write(audio_bytes.getvalue())
-            audio = AudioSegment.from_file(webm_path)
-            wav_path = os.path.join(temp_dir, "input.wav")
-            audio.export(wav_path, format="wav")
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_path) as source:
-                audio_data = recognizer.record(source)
-            query = recognizer.recognize_google(audio_data)
+            with timer.stage("transcription"):
+                query, trimmed = transcribe(audio_bytes.getvalue(), engine=asr_engine)
+            st.caption(f"Recognized {trimmed['kept_ms'] / 1000:.1f}s of speech, trimmed {trimmed['dropped_ms'] / 1000:.1f}s of silence")
             st.session_state.chat_history.append({"type": "user", "content": query, "timestamp": datetime.now().strftime("%H:%M")})
-            os.remove(webm_path)
-            os.remove(wav_path)
-            os.rmdir(temp_dir)
         except Exception as e:
             st.error(f"Speech recognition failed: {str(e)}")
 
@@ -167,36 +176,79 @@ with st.expander("💬 Ask Your Question"):
     query = st.text_input("Or type your question:", value=query)
 
 # Answering
+speech = None
+answered = None
 if query and st.session_state.document_processed:
     if not any(m['content'] == query for m in st.session_state.chat_history if m['type'] == 'user'):
         st.session_state.chat_history.append({"type": "user", "content": query, "timestamp": datetime.now().strftime("%H:%M")})
     with st.spinner("Answering your question..."):
         try:
-            docs = docsearch.similarity_search(query)
-            result = chain.invoke({"input_documents": docs, "question": query})
-            answer = result.get("output_text", "I couldn't find a good answer.")
+            answer_cache = shared_answer_cache()
+
+            def answer_question():
+                """Retrieve and answer the question, returning what the rest of the page needs"""
+                with timer.stage("retrieval"):
+                    # Unambiguous keyword lookups skip embedding the question
+                    docs = retriever.fast_path(query)
+                    query_vector, cached = None, None
+                    if docs is None:
+                        # Reuse a cached answer for the same or a near-identical question
+                        query_vector = embeddings.embed_query(query)
+                        cached = answer_cache.lookup_semantic(doc_id, query_vector)
+                        if cached is None:
+                            docs = retriever.search(query, query_vector=query_vector)
+                    if cached is None:
+                        cached = answer_cache.lookup_exact(doc_id, query, docs)
+                flight = {"docs": docs, "query_vector": query_vector, "cached": bool(cached)}
+                if cached:
+                    return {**flight, "answer": cached["answer"], "audio": cached["audio"]}
+
+                # Merge overlapping chunks and fill the prompt up to the token budget
+                context_docs, _ = pack_context(docs, max_tokens=st.secrets.get("context_tokens", MAX_CONTEXT_TOKENS))
+                if stream_answers:
+                    # Render tokens into the bot bubble as they arrive
+                    bubble = st.empty()
+                    parts = []
+                    with timer.stage("answer"):
+                        for token in stream_answer(chat_llm, context_docs, query):
+                            parts.append(token)
+                            bubble.markdown(f"<div class='chat-bubble bot-bubble'>{''.join(parts)}▌</div>", unsafe_allow_html=True)
+                    bubble.empty()
+                    answer = "".join(parts) or "I couldn't find a good answer."
+                else:
+                    with timer.stage("answer"):
+                        result = chain.invoke({"input_documents": context_docs, "question": query})
+                    answer = result.get("output_text", "I couldn't find a good answer.")
+                return {**flight, "answer": answer, "audio": None}
+
+            # Sessions asking the same question about the same document share one embedding, LLM and TTS run
+            flight, shared = shared_single_flight("answer").do(question_key(doc_id, query), answer_question)
+            if shared:
+                st.caption("🤝 Answered together with others asking the same question")
+            if flight["query_vector"] is None:
+                st.caption("🔎 Keyword match, answered from the lexical index")
+            if flight["cached"]:
+                st.caption("⚡ Answered from cache")
+            answer = flight["answer"]
             st.session_state.chat_history.append({"type": "bot", "content": answer, "timestamp": datetime.now().strftime("%H:%M")})
 
-            # Generate unique filename for each response
+            # Generate unique id for each response
             response_id = str(uuid.uuid4())
-            tts = gTTS(text=answer, lang='en')
-            
-            # Create temp directory for this response
-            temp_dir = tempfile.mkdtemp()
-            audio_path = os.path.join(temp_dir, f"response_{response_id}.mp3")
-            tts.save(audio_path)
-            
-            # Store audio in session state
-            with open(audio_path, "rb") as audio_file:
-                st.session_state.audio_responses[response_id] = audio_file.read()
-            
-            # Display audio player
-            st.audio(st.session_state.audio_responses[response_id], format="audio/mp3")
-            
-            # Clean up
-            os.remove(audio_path)
-            os.rmdir(temp_dir)
-            
+            audio_slot = st.empty()
+            if flight["audio"] is not None:
+                st.session_state.audio_responses[response_id] = flight["audio"]
+                audio_slot.audio(flight["audio"], format=tts_engine.format)
+            else:
+                # Show the text now and attach the audio at the end of the page once the worker has it
+                speech = submit_speech(answer, lang="en", engine=tts_engine, timer=timer)
+                if not flight["cached"] and not shared:
+                    speech.add_done_callback(lambda done: done.exception() or answer_cache.put(
+                        doc_id, query, flight["docs"], flight["query_vector"], answer, done.result()
+                    ))
+                audio_slot.caption("🔊 Preparing audio...")
+            timer.mark("text")
+            answered = {"cached": flight["cached"], "shared": shared}
+
         except Exception as e:
             st.error(f"Response error: {str(e)}")
 
@@ -228,4 +280,23 @@ if st.button("📌 Summarize Chat"):
         <pre style='white-space: pre-wrap;font-size:13px;'>{summary}</pre>
         <button onclick=\"this.parentElement.style.display='none'\" style='margin-top:10px;background:#4f46e5;color:#fff;border:none;padding:0.5rem 1rem;border-radius:6px;'>Close</button>
     </div>
-    """, height=400)
\ No newline at end of file
+    """, height=400)
+
+# Attach the spoken answer once the worker has synthesized it
+if speech is not None:
+    try:
+        st.session_state.audio_responses[response_id] = speech.result()
+        timer.mark("audio")
+        with audio_slot.container():
+            st.audio(st.session_state.audio_responses[response_id], format=tts_engine.format)
+            st.caption(f"⏱️ {timer.summary()}")
+        timer.log()
+    except Exception as e:
+        audio_slot.error(f"Speech synthesis failed: {str(e)}")
+
+# Timings and counts of this question, for the metrics log and the debug panel
+if answered is not None:
+    write_jsonl(request_record(timer, app="edu", **answered), st.secrets.get("metrics_jsonl"))
+if show_debug:
+    with st.sidebar:
+        debug_panel(timer)
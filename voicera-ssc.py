@@ -1,21 +1,22 @@
 import streamlit as st
 import os
-import tempfile
-import speech_recognition as sr
-from gtts import gTTS
-from PyPDF2 import PdfReader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_cohere import CohereEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import Cohere
-from langchain.chains.question_answering import load_qa_chain
-from pydub import AudioSegment
 from datetime import datetime
 import streamlit.components.v1 as components
 import uuid
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import get_asr_engine, transcribe
+from voicera_core.context import MAX_CONTEXT_TOKENS, pack_context
+from voicera_core.metrics import debug_panel, request_record, write_jsonl
+from voicera_core.resources import syllabus_resources
+from voicera_core.singleflight import question_key, shared_single_flight
+from voicera_core.streaming import stream_answer
+from voicera_core.timing import StageTimer
+from voicera_core.tts import get_tts_engine, submit_speech
 
-# Load Cohere API key
-cohere_api_key = st.secrets["cohere_api_key"]
+# Speech engine for this deployment: "gtts" (default), "espeak" or "piper"
+tts_engine = get_tts_engine(st.secrets.get("tts_engine"))
+# Speech recognizer: "google" (default), "vosk" or "whisper", loaded once per process
+asr_engine = get_asr_engine(st.secrets.get("asr_engine"))
 
 # Page config
 st.set_page_config(
@@ -88,28 +89,21 @@ if "audio_responses" not in st.session_state:
     st.session_state.audio_responses = {}
 
 # Load documents from 'pdf_docs' folder
-doc_text = ""
 pdf_folder = "SSC_Syllabus"
 pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
 
 if pdf_files:
     with st.spinner("Loading and processing PDFs..."):
         try:
-            for pdf_file in pdf_files:
-                reader = PdfReader(os.path.join(pdf_folder, pdf_file))
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        doc_text += text.strip() + "\n"
-
-            splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
-            texts = splitter.split_text(doc_text)
-            embeddings = CohereEmbeddings(cohere_api_key=cohere_api_key, model="embed-english-v3.0")
-            docsearch = FAISS.from_texts(texts, embeddings)
-            llm = Cohere(cohere_api_key=cohere_api_key, temperature=0.3)
-            chain = load_qa_chain(llm, chain_type="stuff")
+            # The index and model clients are built once per server process and shared by every session
+            resources = syllabus_resources(st.secrets, pdf_folder)
+            docsearch, retriever, texts = resources.docsearch, resources.retriever, resources.texts
+            embeddings, chain, chat_llm = resources.clients.embeddings, resources.clients.chain, resources.clients.chat_llm
             st.session_state.document_processed = True
-            st.success(f"{len(pdf_files)} PDFs processed ({len(texts)} sections)")
+            st.success(f"{len(pdf_files)} PDFs loaded ({len(texts)} sections)")
+            for change, files in resources.changes.items():
+                if files:
+                    st.info(f"Re-indexed {len(files)} {change} PDF(s): {', '.join(files)}")
         except Exception as e:
             st.error(f"Failed to process PDFs: {str(e)}")
 else:
@@ -124,6 +118,11 @@ with st.sidebar:
             st.write(f"- {f}")
     else:
         st.info("Add PDFs to `pdf_docs/` folder to enable features.")
+    stream_answers = st.checkbox("Stream answers as they are generated", value=True)
+    show_debug = st.checkbox("Show debug metrics", value=st.secrets.get("debug_panel", False))
+
+# Times and counts everything done for this question, in this thread and the speech worker
+timer = StageTimer().activate()
 
 # Question Input
 with st.expander("💬 Ask Your Question"):
@@ -133,21 +132,10 @@ with st.expander("💬 Ask Your Question"):
     audio_bytes = st.audio_input("Speak your question:")
     if audio_bytes:
         try:
-            temp_dir = tempfile.mkdtemp()
-            webm_path = os.path.join(temp_dir, "input.webm")
-            with open(webm_path, "wb") as f:
-                f.write(audio_bytes.getvalue())
-            audio = AudioSegment.from_file(webm_path)
-            wav_path = os.path.join(temp_dir, "input.wav")
-            audio.export(wav_path, format="wav")
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_path) as source:
-                audio_data = recognizer.record(source)
-            query = recognizer.recognize_google(audio_data)
+            with timer.stage("transcription"):
+                query, trimmed = transcribe(audio_bytes.getvalue(), engine=asr_engine)
+            st.caption(f"Recognized {trimmed['kept_ms'] / 1000:.1f}s of speech, trimmed {trimmed['dropped_ms'] / 1000:.1f}s of silence")
             st.session_state.chat_history.append({"type": "user", "content": query, "timestamp": datetime.now().strftime("%H:%M")})
-            os.remove(webm_path)
-            os.remove(wav_path)
-            os.rmdir(temp_dir)
         except Exception as e:
             st.error(f"Speech recognition failed: {str(e)}")
 
@@ -155,26 +143,81 @@ with st.expander("💬 Ask Your Question"):
     query = st.text_input("Or type your question:", value=query)
 
 # Answering
+speech = None
+answered = None
 if query and st.session_state.document_processed:
     if not any(m['content'] == query for m in st.session_state.chat_history if m['type'] == 'user'):
         st.session_state.chat_history.append({"type": "user", "content": query, "timestamp": datetime.now().strftime("%H:%M")})
     with st.spinner("Answering your question..."):
         try:
-            docs = docsearch.similarity_search(query)
-            result = chain.invoke({"input_documents": docs, "question": query})
-            answer = result.get("output_text", "I couldn't find a good answer.")
+            answer_cache = shared_answer_cache()
+
+            def answer_question():
+                """Retrieve and answer the question, returning what the rest of the page needs"""
+                with timer.stage("retrieval"):
+                    # Only search the subject shards the router picks for this question
+                    shards = docsearch.route(query)
+                    # Unambiguous keyword lookups skip embedding the question
+                    docs = retriever.fast_path(query, shards=shards)
+                    query_vector, cached = None, None
+                    if docs is None:
+                        # Reuse a cached answer for the same or a near-identical question
+                        query_vector = embeddings.embed_query(query)
+                        cached = answer_cache.lookup_semantic(docsearch.version, query_vector)
+                        if cached is None:
+                            docs = retriever.search(query, shards=shards, query_vector=query_vector)
+                    if cached is None:
+                        cached = answer_cache.lookup_exact(docsearch.version, query, docs)
+                flight = {"docs": docs, "query_vector": query_vector, "shards": shards, "cached": bool(cached)}
+                if cached:
+                    return {**flight, "answer": cached["answer"], "audio": cached["audio"]}
+
+                # Merge overlapping chunks and fill the prompt up to the token budget
+                context_docs, _ = pack_context(docs, max_tokens=st.secrets.get("context_tokens", MAX_CONTEXT_TOKENS))
+                if stream_answers:
+                    # Render tokens into the bot bubble as they arrive
+                    bubble = st.empty()
+                    parts = []
+                    with timer.stage("answer"):
+                        for token in stream_answer(chat_llm, context_docs, query):
+                            parts.append(token)
+                            bubble.markdown(f"<div class='chat-bubble bot-bubble'>{''.join(parts)}▌</div>", unsafe_allow_html=True)
+                    bubble.empty()
+                    answer = "".join(parts) or "I couldn't find a good answer."
+                else:
+                    with timer.stage("answer"):
+                        result = chain.invoke({"input_documents": context_docs, "question": query})
+                    answer = result.get("output_text", "I couldn't find a good answer.")
+                return {**flight, "answer": answer, "audio": None}
+
+            # Sessions asking the same question at the same time share one embedding, LLM and TTS run
+            flight, shared = shared_single_flight("answer").do(question_key(docsearch.version, query), answer_question)
+            if shared:
+                st.caption("🤝 Answered together with others asking the same question")
+            if flight["query_vector"] is None:
+                st.caption("🔎 Keyword match, answered from the lexical index")
+            if flight["cached"]:
+                st.caption("⚡ Answered from cache")
+            elif len(flight["shards"]) < len(docsearch.shards):
+                st.caption(f"Searched: {', '.join(flight['shards'])}")
+            answer = flight["answer"]
             st.session_state.chat_history.append({"type": "bot", "content": answer, "timestamp": datetime.now().strftime("%H:%M")})
 
             response_id = str(uuid.uuid4())
-            tts = gTTS(text=answer, lang='en')
-            temp_dir = tempfile.mkdtemp()
-            audio_path = os.path.join(temp_dir, f"response_{response_id}.mp3")
-            tts.save(audio_path)
-            with open(audio_path, "rb") as audio_file:
-                st.session_state.audio_responses[response_id] = audio_file.read()
-            st.audio(st.session_state.audio_responses[response_id], format="audio/mp3")
-            os.remove(audio_path)
-            os.rmdir(temp_dir)
+            audio_slot = st.empty()
+            if flight["audio"] is not None:
+                st.session_state.audio_responses[response_id] = flight["audio"]
+                audio_slot.audio(flight["audio"], format=tts_engine.format)
+            else:
+                # Show the text now and attach the audio at the end of the page once the worker has it
+                speech = submit_speech(answer, lang="en", engine=tts_engine, timer=timer)
+                if not flight["cached"] and not shared:
+                    speech.add_done_callback(lambda done: done.exception() or answer_cache.put(
+                        docsearch.version, query, flight["docs"], flight["query_vector"], answer, done.result()
+                    ))
+                audio_slot.caption("🔊 Preparing audio...")
+            timer.mark("text")
+            answered = {"cached": flight["cached"], "shared": shared}
         except Exception as e:
             st.error(f"Response error: {str(e)}")
 
@@ -207,3 +250,22 @@ if st.button("📌 Summarize Chat"):
         <button onclick=\"this.parentElement.style.display='none'\" style='margin-top:10px;background:#4f46e5;color:#fff;border:none;padding:0.5rem 1rem;border-radius:6px;'>Close</button>
     </div>
     """, height=400)
+
+# Attach the spoken answer once the worker has synthesized it
+if speech is not None:
+    try:
+        st.session_state.audio_responses[response_id] = speech.result()
+        timer.mark("audio")
+        with audio_slot.container():
+            st.audio(st.session_state.audio_responses[response_id], format=tts_engine.format)
+            st.caption(f"⏱️ {timer.summary()}")
+        timer.log()
+    except Exception as e:
+        audio_slot.error(f"Speech synthesis failed: {str(e)}")
+
+# Timings and counts of this question, for the metrics log and the debug panel
+if answered is not None:
+    write_jsonl(request_record(timer, app="ssc", **answered), st.secrets.get("metrics_jsonl"))
+if show_debug:
+    with st.sidebar:
+        debug_panel(timer)
@@ -0,0 +1 @@
+"""Shared ingestion, retrieval and speech helpers for the Voicera apps"""
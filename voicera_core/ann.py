@@ -0,0 +1,74 @@
+import logging
+import math
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+INDEX_KINDS = ("flat", "ivfpq", "hnsw", "pca")
+# Below this many vectors the trained indexes have too little data to learn from
+MIN_TRAIN_VECTORS = 1000
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 8
+
+logger = logging.getLogger(__name__)
+
+
+def needs_training(kind):
+    return kind in ("ivfpq", "pca")
+
+
+def factory_string(kind, dim, n_vectors):
+    """FAISS index_factory description for an index kind sized to the data"""
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_NEIGHBORS}"
+    if kind == "pca":
+        return f"PCA{max(16, dim // 4)},Flat"
+    if kind == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        # One byte per sub-vector, with sub-vectors of about 8 dimensions
+        m = max(d for d in range(1, dim // 8 + 1) if dim % d == 0)
+        nbits = max(1, min(8, int(math.log2(max(2, n_vectors // 39)))))
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unknown index kind {kind!r}, expected one of {', '.join(INDEX_KINDS)}")
+
+
+def build_faiss_index(kind, vectors, min_train_vectors=MIN_TRAIN_VECTORS):
+    """Create an empty FAISS index of the given kind, trained on vectors if it needs training
+
+    Falls back to a flat index, with a warning, when there are fewer than
+    min_train_vectors to train on.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    if needs_training(kind) and n_vectors < min_train_vectors:
+        logger.warning("Only %d vectors to train a %s index on, %d needed: using a flat index", n_vectors, kind, min_train_vectors)
+        kind = "flat"
+    index = faiss.index_factory(dim, factory_string(kind, dim, n_vectors))
+    if not index.is_trained:
+        index.train(vectors)
+    if kind == "hnsw":
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif kind == "ivfpq":
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    return index
+
+
+def make_store(kind, text_embeddings, embeddings, metadatas=None, ids=None, min_train_vectors=MIN_TRAIN_VECTORS):
+    """Build a langchain FAISS store on an index of the given kind"""
+    text_embeddings = list(text_embeddings)
+    if kind == "flat":
+        return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+    index = build_faiss_index(kind, [v for _, v in text_embeddings], min_train_vectors)
+    store = FAISS(embeddings, index, InMemoryDocstore(), {})
+    store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return store
+
+
+def index_bytes(index):
+    """Serialized size of an index, a close proxy for its memory footprint"""
+    return faiss.serialize_index(index).nbytes
@@ -0,0 +1,133 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from voicera_core.metrics import cache_lookup
+
+MAX_ENTRIES = 512
+TTL_SECONDS = 6 * 3600
+SIMILARITY_THRESHOLD = 0.95
+
+_shared = None
+_shared_lock = Lock()
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def chunk_ids(docs):
+    """Stable ids of the retrieved chunks, taken from their content"""
+    return tuple(hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16] for doc in docs)
+
+
+class AnswerCache:
+    """Two-tier LRU cache of answers with their audio
+
+    The exact tier is keyed on the normalized question plus the ids of the
+    chunks retrieved for it. The semantic tier reuses an answer when a new
+    query embedding has cosine similarity of at least threshold with a
+    cached one. Entries are scoped to a namespace, normally the version of
+    the index they were answered from, and expire after ttl seconds.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _alive(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup_semantic(self, namespace, vector):
+        """Return the live cached entry whose query embedding is closest to vector, if close enough
+
+        Candidates are tried from the closest down, so an expired best match
+        is evicted rather than hiding a live one above the threshold.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if key[0] == namespace and entry["vector"] is not None]
+            if keys:
+                scores = np.stack([self._entries[key]["vector"] for key in keys]) @ query
+                for best in np.argsort(-scores, kind="stable"):
+                    if scores[best] < self.threshold:
+                        break
+                    entry = self._alive(keys[best])
+                    if entry is not None:
+                        self.semantic_hits += 1
+                        cache_lookup("answer_semantic", 1)
+                        return entry
+        cache_lookup("answer_semantic", 0, 1)
+        return None
+
+    def lookup_exact(self, namespace, question, docs):
+        """Return the entry for this question and retrieved chunks, counting a miss if there is none"""
+        with self._lock:
+            entry = self._alive((namespace, normalize_question(question), chunk_ids(docs)))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.exact_hits += 1
+        cache_lookup("answer_exact", int(entry is not None), int(entry is None))
+        return entry
+
+    def put(self, namespace, question, docs, vector, answer, audio=None):
+        """Cache an answer and its audio for both tiers"""
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        key = (namespace, normalize_question(question), chunk_ids(docs))
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "audio": audio,
+                "vector": vector,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+def shared_answer_cache():
+    """Return the AnswerCache shared by every session in this process"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AnswerCache()
+        return _shared
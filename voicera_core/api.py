@@ -0,0 +1,153 @@
+"""Async HTTP API over the Voicera question answering pipeline
+
+Usage: python -m voicera_core.api [--host 0.0.0.0] [--port 8080] [--workers 8] [--offline]
+
+Endpoints:
+  POST /v1/ask          JSON {"question": "...", "speak": true}
+  POST /v1/ask/voice    recorded question as the request body, ?speak=0 to skip audio
+  GET  /v1/stats        answer cache and request coalescing counters
+  GET  /metrics         stage latencies, provider calls, tokens and cache hits in Prometheus format
+  GET  /healthz
+
+Answers are JSON with the answer text, its sources, how it was found and
+the spoken answer as base64 in audio_format. The pipeline blocks on provider
+calls, so requests run on a thread pool while the event loop keeps
+accepting connections. --offline serves the syllabus with the local
+stand-in providers, no API keys or network needed. With VOICERA_METRICS_JSONL
+set, the timings and counts of every request are appended to that file.
+"""
+import argparse
+import asyncio
+import base64
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import AudioDecodeError
+from voicera_core.metrics import shared_metrics, write_jsonl
+from voicera_core.singleflight import single_flight_stats
+
+MAX_WORKERS = 8
+MAX_UPLOAD_BYTES = 20 * 2 ** 20
+
+ENGINE = web.AppKey("engine", object)
+EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+
+
+def _response(request, result):
+    write_jsonl({
+        **result["metrics"], "endpoint": request.path,
+        **{key: result[key] for key in ("cached", "shared", "lexical", "cache")},
+    })
+    result = dict(result)
+    if result.get("audio") is not None:
+        result["audio"] = base64.b64encode(result["audio"]).decode("ascii")
+    return web.json_response(result)
+
+
+async def _run(request, method, *args, **kwargs):
+    """Run a blocking engine call on the worker pool
+
+    Getting the engine is part of the call, as it may rebuild the index when
+    the PDFs changed and must not hold up the event loop either.
+    """
+    get_engine = request.app[ENGINE]
+
+    def call():
+        return getattr(get_engine(), method)(*args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(request.app[EXECUTOR], contextvars.copy_context().run, call)
+
+
+async def ask(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Expected a JSON body")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise web.HTTPBadRequest(text="question is required")
+    speak = body.get("speak", True)
+    if not isinstance(speak, bool):
+        raise web.HTTPBadRequest(text="speak must be true or false")
+    try:
+        result = await _run(request, "answer", question.strip(), speak=speak)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+    return _response(request, result)
+
+
+async def ask_voice(request):
+    data = await request.read()
+    if not data:
+        raise web.HTTPBadRequest(text="Expected the recorded question as the request body")
+    speak = request.query.get("speak", "1") not in ("0", "false")
+    try:
+        result = await _run(request, "answer_audio", data, speak=speak)
+    except AudioDecodeError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+    return _response(request, result)
+
+
+async def stats(request):
+    return web.json_response({"answer_cache": shared_answer_cache().stats(), "single_flight": single_flight_stats()})
+
+
+async def metrics(request):
+    return web.Response(text=shared_metrics().prometheus(), content_type="text/plain")
+
+
+async def healthz(request):
+    return web.json_response({"status": "ok"})
+
+
+def create_app(get_engine, max_workers=MAX_WORKERS):
+    """aiohttp application answering with the engine get_engine() returns for each request"""
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app[ENGINE] = get_engine
+    app[EXECUTOR] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voicera-api")
+
+    async def shutdown(app):
+        app[EXECUTOR].shutdown(wait=False)
+
+    app.on_cleanup.append(shutdown)
+    app.add_routes([
+        web.post("/v1/ask", ask),
+        web.post("/v1/ask/voice", ask_voice),
+        web.get("/v1/stats", stats),
+        web.get("/metrics", metrics),
+        web.get("/healthz", healthz),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--offline", action="store_true", help="use the local stand-in providers")
+    args = parser.parse_args()
+
+    if args.offline:
+        from voicera_core.resources import offline_engine
+
+        get_engine = offline_engine
+    else:
+        import streamlit as st
+        from voicera_core.resources import syllabus_engine
+
+        def get_engine():
+            return syllabus_engine(st.secrets)
+    # Build the index and clients before accepting requests
+    get_engine()
+    web.run_app(create_app(get_engine, args.workers), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import os
+from io import BytesIO
+from threading import Lock
+
+import numpy as np
+import speech_recognition as sr
+from pydub import AudioSegment
+from pydub.exceptions import CouldntDecodeError
+from pydub.silence import detect_nonsilent
+
+from voicera_core.metrics import count, span
+
+DEFAULT_ENGINE = "google"
+SAMPLE_RATE = 16000
+# Quieter than the clip's average loudness by this many dB counts as silence
+SILENCE_BELOW_AVERAGE_DB = 16
+MIN_SILENCE_MS = 300
+KEEP_SILENCE_MS = 150
+
+_engines = {}
+_engines_lock = Lock()
+
+
+class AudioDecodeError(ValueError):
+    """Recorded audio that is corrupt or in a format that cannot be read here"""
+
+
+def decode_audio(data, format=None):
+    """Decode recorded audio bytes into an AudioSegment without touching disk
+
+    WAV (what st.audio_input records) is parsed in Python, other formats
+    are piped through ffmpeg.
+    """
+    if format is None and data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        format = "wav"
+    try:
+        return AudioSegment.from_file(BytesIO(data), format=format)
+    except CouldntDecodeError as e:
+        raise AudioDecodeError(f"Could not decode the audio: {e}") from e
+    except FileNotFoundError as e:
+        # pydub falls back to ffmpeg for anything its WAV parser rejects
+        raise AudioDecodeError("Could not decode the audio, send WAV or install ffmpeg for other formats") from e
+
+
+def preprocess(segment, min_silence_ms=MIN_SILENCE_MS, keep_silence_ms=KEEP_SILENCE_MS):
+    """Downmix to 16 kHz 16-bit mono and cut leading, trailing and long inner silences
+
+    Returns (segment, report) where report gives the original, kept and
+    dropped milliseconds.
+    """
+    original_ms = len(segment)
+    segment = segment.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+    if segment.dBFS != float("-inf"):
+        voiced = detect_nonsilent(segment, min_silence_len=min_silence_ms,
+                                  silence_thresh=segment.dBFS - SILENCE_BELOW_AVERAGE_DB, seek_step=10)
+        if voiced:
+            pieces = [segment[max(0, start - keep_silence_ms):end + keep_silence_ms] for start, end in voiced]
+            segment = sum(pieces[1:], pieces[0])
+    return segment, {"original_ms": original_ms, "kept_ms": len(segment), "dropped_ms": original_ms - len(segment)}
+
+
+def to_audio_data(segment):
+    """Wrap a segment's PCM samples for speech_recognition, downmixed to mono"""
+    segment = segment.set_channels(1)
+    return sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
+
+
+class ASREngine:
+    """Speech recognition backend
+
+    Subclasses set name and implement transcribe, which takes an
+    sr.AudioData and returns the recognized text. One instance is shared by
+    every session in the process, so models are loaded once in __init__.
+    """
+
+    name = None
+
+    def transcribe(self, audio_data, lang="en-US"):
+        raise NotImplementedError
+
+
+class GoogleASR(ASREngine):
+    """Google Web Speech API, one network round trip per question"""
+
+    name = "google"
+
+    def transcribe(self, audio_data, lang="en-US"):
+        return sr.Recognizer().recognize_google(audio_data, language=lang)
+
+
+class VoskASR(ASREngine):
+    """Vosk (Kaldi) model running locally on the CPU
+
+    model is the directory of an unpacked Vosk model, e.g.
+    vosk-model-small-en-us-0.15. The model language is fixed, lang is ignored.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model=None):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("vosk is not installed, run pip install vosk")
+        path = model or os.environ.get("VOICERA_VOSK_MODEL")
+        if not path or not os.path.isdir(path):
+            raise RuntimeError("Set VOICERA_VOSK_MODEL to the directory of a Vosk model")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(path)
+
+    def transcribe(self, audio_data, lang="en-US"):
+        # The model is shared, each call gets its own recognizer
+        recognizer = self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+class WhisperASR(ASREngine):
+    """Whisper running locally on the CPU through faster-whisper (CTranslate2)
+
+    model is a model size such as "base.en" or "small", or the directory of
+    a converted model.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model=None, compute_type="int8"):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("faster-whisper is not installed, run pip install faster-whisper")
+        self.model = WhisperModel(model or os.environ.get("VOICERA_WHISPER_MODEL", "base.en"),
+                                  device="cpu", compute_type=compute_type)
+
+    def transcribe(self, audio_data, lang="en-US"):
+        pcm = audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(samples, language=lang.split("-")[0], beam_size=1)
+        return " ".join(segment.text.strip() for segment in segments)
+
+
+ENGINES = {
+    "google": GoogleASR,
+    "vosk": VoskASR,
+    "whisper": WhisperASR,
+}
+
+
+def get_asr_engine(name=None):
+    """Return the process-wide engine called name, or the one set by VOICERA_ASR_ENGINE"""
+    name = name or os.environ.get("VOICERA_ASR_ENGINE") or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown ASR engine {name!r}, expected one of {', '.join(ENGINES)}")
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]()
+        return _engines[name]
+
+
+def transcribe(data, engine=None, lang="en-US"):
+    """Return (text, report) for the recorded audio bytes
+
+    engine is an engine name or ASREngine, defaulting to get_asr_engine().
+    The audio is preprocessed first, report says how much of it was dropped.
+    """
+    if not isinstance(engine, ASREngine):
+        engine = get_asr_engine(engine)
+    with span("asr_preprocess"):
+        segment, report = preprocess(decode_audio(data))
+    count("voicera_provider_calls_total", provider=engine.name, kind="asr")
+    with span("asr"):
+        return engine.transcribe(to_audio_data(segment), lang), report
@@ -0,0 +1,149 @@
+import mmap
+import os
+import tempfile
+from collections.abc import Mapping, Sequence
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+
+
+def mmap_flags(index_kind):
+    """faiss.read_index flags that map an index of this kind read-only instead of copying it"""
+    if index_kind == "ivfpq":
+        # IVF lists have their own on-disk mapping
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+class ChunkStore(Sequence):
+    """Chunk texts stored as one UTF-8 file plus an array of offsets
+
+    With use_mmap both files are memory-mapped read-only, so processes that
+    open the same store share its pages in the OS page cache and a text is
+    only decoded when it is asked for.
+    """
+
+    def __init__(self, index_dir, use_mmap=True):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r" if use_mmap else None)
+        with open(os.path.join(index_dir, TEXTS_FILE), "rb") as f:
+            if use_mmap and self.offsets[-1] > 0:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = f.read()
+
+    @staticmethod
+    def write(index_dir, texts):
+        """Write texts as a new store, replacing any previous one"""
+        offsets = [0]
+        fd, texts_tmp = tempfile.mkstemp(dir=index_dir, prefix=TEXTS_FILE + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            for text in texts:
+                offsets.append(offsets[-1] + f.write(text.encode("utf-8")))
+        fd, offsets_tmp = tempfile.mkstemp(dir=index_dir, prefix=OFFSETS_FILE + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+        os.replace(texts_tmp, os.path.join(index_dir, TEXTS_FILE))
+        os.replace(offsets_tmp, os.path.join(index_dir, OFFSETS_FILE))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+
+class ChunkSlice(Sequence):
+    """The texts of one PDF within a ChunkStore"""
+
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.store[self.start + i]
+
+
+class SourceDocuments(Sequence):
+    """Documents for {source: texts}, created only when indexed"""
+
+    def __init__(self, source_texts):
+        self.items = [(source, texts) for source, texts in source_texts.items()]
+        self.starts = np.cumsum([0] + [len(texts) for _, texts in self.items])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        n = int(np.searchsorted(self.starts, i, side="right")) - 1
+        source, texts = self.items[n]
+        return Document(page_content=texts[i - int(self.starts[n])], metadata={"source": source})
+
+
+class ChunkDocstore(Docstore):
+    """Read-only docstore answering "<source>#<n>" ids from a sequence of texts"""
+
+    def __init__(self, source, texts):
+        self.source = source
+        self.texts = texts
+
+    def search(self, search):
+        source, _, n = search.rpartition("#")
+        if source == self.source and n.isdigit() and int(n) < len(self.texts):
+            return Document(page_content=self.texts[int(n)], metadata={"source": source}, id=search)
+        return f"ID {search} not found."
+
+    def add(self, texts):
+        raise NotImplementedError("ChunkDocstore is read-only")
+
+
+class ShardIds(Mapping):
+    """index_to_docstore_id of a shard whose n-th vector is chunk "<source>#<n>" """
+
+    def __init__(self, source, size):
+        self.source = source
+        self.size = size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        return f"{self.source}#{i}"
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+
+def load_shard(path, source, texts, embeddings, index_kind="flat", use_mmap=True):
+    """Open a saved shard as a FAISS store backed by texts, memory-mapping its vectors"""
+    index = faiss.read_index(os.path.join(path, "index.faiss"), mmap_flags(index_kind) if use_mmap else 0)
+    if index.ntotal != len(texts):
+        raise ValueError(f"Shard {path} has {index.ntotal} vectors for {len(texts)} chunks")
+    return shard_store(index, source, texts, embeddings)
+
+
+def shard_store(index, source, texts, embeddings):
+    return FAISS(embeddings, index, ChunkDocstore(source, texts), ShardIds(source, index.ntotal))
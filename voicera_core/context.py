@@ -0,0 +1,114 @@
+import logging
+
+from langchain_core.documents import Document
+
+from voicera_core.embedding_executor import estimate_tokens
+from voicera_core.metrics import count
+
+MAX_CONTEXT_TOKENS = 1200
+# Shortest shared text that counts as two chunks overlapping
+MIN_OVERLAP = 40
+MAX_OVERLAP = 400
+# Shorter lines (headings, numbers) may legitimately repeat
+MIN_DUPLICATE_LINE = 20
+
+logger = logging.getLogger(__name__)
+
+
+def _overlap(first, second, min_overlap=MIN_OVERLAP, max_overlap=MAX_OVERLAP):
+    """Length of the longest suffix of first that is a prefix of second"""
+    head = second[:min_overlap]
+    if len(head) < min_overlap:
+        return 0
+    start = max(0, len(first) - max_overlap)
+    while True:
+        start = first.find(head, start)
+        if start < 0:
+            return 0
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start += 1
+
+
+def _merge(first, second):
+    """Join two chunks if one contains or runs on into the other, else None"""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    n = _overlap(first, second)
+    if n:
+        return first + second[n:]
+    n = _overlap(second, first)
+    if n:
+        return second + first[n:]
+    return None
+
+
+def _fit(text, budget):
+    """Cut text at a line boundary to at most budget tokens"""
+    kept = []
+    for line in text.split("\n"):
+        if estimate_tokens("\n".join(kept + [line])) > budget:
+            break
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def pack_context(docs, max_tokens=MAX_CONTEXT_TOKENS):
+    """Merge overlapping chunks, drop repeated lines and fill a token budget by relevance
+
+    docs are the retrieved chunks, most relevant first. Chunks from the same
+    source that overlap (neighbours cut with chunk_overlap) are joined into
+    one passage. Lines already present in a more relevant passage are
+    removed, and passages are added in relevance order until max_tokens is
+    reached, the last one cut at a line boundary.
+
+    Returns (packed_docs, report) where report has the estimated prompt
+    tokens before and after packing.
+    """
+    passages = []
+    for doc in docs:
+        text, source = doc.page_content, doc.metadata.get("source")
+        for passage in passages:
+            if passage["source"] == source:
+                merged = _merge(passage["text"], text)
+                if merged is not None:
+                    passage["text"] = merged
+                    break
+        else:
+            passages.append({"text": text, "source": source, "metadata": dict(doc.metadata)})
+
+    seen, packed, used = set(), [], 0
+    for passage in passages:
+        lines = []
+        for line in passage["text"].split("\n"):
+            key = " ".join(line.split()).lower()
+            if len(key) >= MIN_DUPLICATE_LINE:
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        text = "\n".join(lines).strip()
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        if used + tokens > max_tokens:
+            text = _fit(text, max_tokens - used).strip()
+            if not text:
+                break
+            tokens = estimate_tokens(text)
+        packed.append(Document(page_content=text, metadata=passage["metadata"]))
+        used += tokens
+
+    report = {
+        "chunks": len(docs),
+        "passages": len(packed),
+        "tokens_before": sum(estimate_tokens(doc.page_content) for doc in docs),
+        "tokens_after": used,
+    }
+    report["tokens_saved"] = report["tokens_before"] - used
+    logger.info("Packed %d chunks into %d passages, %d prompt tokens (saved %d)",
+                report["chunks"], report["passages"], used, report["tokens_saved"])
+    count("voicera_context_tokens_saved_total", report["tokens_saved"])
+    return packed, report
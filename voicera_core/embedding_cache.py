@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from voicera_core.embedding_executor import BatchedEmbeddings, EmbeddingBatchError
+from voicera_core.metrics import InstrumentedEmbeddings, cache_lookup
+
+CACHE_PATH = os.path.join(".voicera_cache", "embeddings.sqlite3")
+MAX_ENTRIES = 50000
+
+_caches = {}
+_caches_lock = Lock()
+
+
+def text_hash(text):
+    """Content address of a chunk of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Disk-backed LRU store of embedding vectors keyed by (model, text hash)"""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Return {text_hash: vector} for the hashes already cached"""
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update((h, np.frombuffer(v, dtype=np.float32).tolist()) for h, v in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        cache_lookup("embedding", hits, len(hashes) - hits)
+        return found
+
+    def put_many(self, model, items):
+        """Store (text_hash, vector) pairs and evict the least recently used overflow"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in items],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+
+def shared_cache(path=CACHE_PATH, max_entries=MAX_ENTRIES):
+    """Return the EmbeddingCache for path, shared by every session in this process"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = EmbeddingCache(path, max_entries)
+        return _caches[path]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends never-seen texts to the provider"""
+
+    def __init__(self, embeddings, model_name=None, cache=None):
+        self.embeddings = embeddings
+        if model_name is None:
+            provider = embeddings
+            while isinstance(provider, (BatchedEmbeddings, InstrumentedEmbeddings)):
+                provider = provider.embeddings
+            model_name = f"{type(provider).__name__}/{getattr(provider, 'model', '')}"
+        self.model_name = model_name
+        self.cache = cache or shared_cache()
+
+    def embed_documents(self, texts):
+        model = self.model_name + ":document"
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(model, hashes)
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, t)
+        if missing:
+            try:
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+            except EmbeddingBatchError as e:
+                # Keep the batches that did finish so a retry only resends the rest
+                done = list(missing.keys())
+                self.cache.put_many(model, [(done[i], v) for i, v in e.completed.items()])
+                raise
+            new = list(zip(missing.keys(), vectors))
+            self.cache.put_many(model, new)
+            found.update(new)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text):
+        # Providers embed queries differently from documents, so they get their own keys
+        model = self.model_name + ":query"
+        h = text_hash(text)
+        found = self.cache.get_many(model, [h])
+        if h in found:
+            return found[h]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(model, [(h, vector)])
+        return vector
@@ -0,0 +1,169 @@
+import contextvars
+import hashlib
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from langchain_core.embeddings import Embeddings
+
+BATCH_SIZE = 96
+# Smaller calls are split no further, even to use every worker
+MIN_BATCH_SIZE = 8
+MAX_CONCURRENCY = 4
+# Cohere trial keys allow roughly 100k tokens per minute
+TOKENS_PER_MINUTE = 100000
+MAX_RETRIES = 5
+
+
+def estimate_tokens(text):
+    """Rough token count used for rate limiting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by concurrent batches"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self, amount=1):
+        """Block until amount tokens are available, then take them"""
+        # A request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingBatchError(Exception):
+    """Raised when some batches still fail after every retry
+
+    completed maps the index of each text that was embedded to its vector,
+    so callers can keep the finished work.
+    """
+
+    def __init__(self, completed, errors):
+        self.completed = completed
+        self.errors = errors
+        super().__init__(f"{len(errors)} embedding batch(es) failed: {errors[0]}")
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings wrapper that sends texts in rate-limited, concurrent, retried batches
+
+    Texts go out in batches of at most batch_size, max_concurrency at a
+    time, and a call smaller than that is split so every worker gets a
+    batch. When some batches still fail the others' vectors come back
+    in EmbeddingBatchError.completed (CachedEmbeddings keeps them, so a
+    retry only resends the failed ones). A text already being embedded by
+    a concurrent call is not sent again; this call waits for that vector.
+    """
+
+    def __init__(self, embeddings, batch_size=BATCH_SIZE, max_concurrency=MAX_CONCURRENCY,
+                 tokens_per_minute=TOKENS_PER_MINUTE, requests_per_minute=None,
+                 max_retries=MAX_RETRIES, backoff=1.0, max_backoff=30.0):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        # Caps provider calls across every concurrent embed_documents call
+        self._slots = BoundedSemaphore(max_concurrency)
+        self._in_flight = {}
+        self._in_flight_lock = Lock()
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", "")
+
+    def _call(self, fn, texts):
+        """Run one provider call under the rate limits, retrying with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            if self.request_bucket:
+                self.request_bucket.acquire()
+            if self.token_bucket:
+                self.token_bucket.acquire(sum(estimate_tokens(t) for t in texts))
+            try:
+                with self._slots:
+                    return fn(texts)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _batches(self, items):
+        """Split items into batches of at most batch_size, spread over every worker when there are enough"""
+        count = -(-len(items) // self.batch_size)
+        count = max(count, min(self.max_concurrency, len(items) // MIN_BATCH_SIZE))
+        size = -(-len(items) // count) if count else 0
+        return [items[i:i + size] for i in range(0, len(items), size)] if size else []
+
+    def _embed_batch(self, batch):
+        """Embed one batch, resolving the Future of each of its texts with its vector or the error"""
+        try:
+            vectors = self._call(self.embeddings.embed_documents, [t for _, t, _ in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+        except BaseException as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, _, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+        finally:
+            with self._in_flight_lock:
+                for key, _, future in batch:
+                    if self._in_flight.get(key) is future:
+                        del self._in_flight[key]
+
+    def embed_documents(self, texts):
+        keys = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+        # Identical texts, in this call or in flight in another one, are embedded once
+        futures, own = {}, []
+        with self._in_flight_lock:
+            for key, text in zip(keys, texts):
+                if key in futures:
+                    continue
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = Future()
+                    own.append((key, text, future))
+                futures[key] = future
+
+        batches = self._batches(own)
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                for batch in batches:
+                    # Each batch runs in its own copy of the caller's context, so metrics reach its timer
+                    pool.submit(contextvars.copy_context().run, self._embed_batch, batch)
+
+        vectors, errors = {}, []
+        for key, future in futures.items():
+            error = future.exception()
+            if error is None:
+                vectors[key] = future.result()
+            elif error not in errors:
+                errors.append(error)
+        if errors:
+            completed = {i: vectors[k] for i, k in enumerate(keys) if k in vectors}
+            raise EmbeddingBatchError(completed, errors)
+        return [vectors[k] for k in keys]
+
+    def embed_query(self, text):
+        return self._call(lambda texts: self.embeddings.embed_query(texts[0]), [text])
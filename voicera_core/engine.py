@@ -0,0 +1,142 @@
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import transcribe
+from voicera_core.context import MAX_CONTEXT_TOKENS, pack_context
+from voicera_core.metrics import request_record
+from voicera_core.singleflight import question_key, shared_single_flight
+from voicera_core.streaming import stream_answer
+from voicera_core.timing import StageTimer
+from voicera_core.tts import get_tts_engine, shared_audio_cache, synthesize_speech
+
+FALLBACK_ANSWER = "I couldn't find a good answer."
+
+
+class VoiceraEngine:
+    """The question → retrieval → LLM → speech pipeline of the apps, without Streamlit
+
+    retriever is a HybridRetriever; when its vector store is a ShardedIndex
+    the question is routed to the relevant shards first. embeddings embed
+    the question for the semantic answer cache, and namespace scopes cached
+    answers to one index version. chain, if given, answers when no on_token
+    callback is passed, as the apps do with streaming turned off.
+    audio_cache defaults to the AudioCache the apps share.
+    """
+
+    def __init__(self, retriever, llm, embeddings, namespace, chain=None, tts_engine=None, asr_engine=None,
+                 answer_cache=None, audio_cache=None, k=4, context_tokens=MAX_CONTEXT_TOKENS, fallback=FALLBACK_ANSWER):
+        self.retriever = retriever
+        self.llm = llm
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.chain = chain
+        self.tts_engine = tts_engine if tts_engine is not None else get_tts_engine()
+        self.asr_engine = asr_engine
+        self.answer_cache = answer_cache if answer_cache is not None else shared_answer_cache()
+        self.audio_cache = audio_cache if audio_cache is not None else shared_audio_cache()
+        self.k = k
+        self.context_tokens = context_tokens
+        self.fallback = fallback
+
+    def retrieve(self, question):
+        """Return (docs, query_vector, cached_entry, info) for a question
+
+        info says how the chunks were found: "route" lists the shards
+        searched, "lexical" is True when the keyword fast path answered and
+        "cache" is "semantic", "exact" or None.
+        """
+        store = self.retriever.vector_store
+        shards = store.route(question) if hasattr(store, "route") else None
+        info = {"route": shards, "lexical": False, "cache": None}
+
+        # Unambiguous keyword lookups skip embedding the question
+        docs = self.retriever.fast_path(question, k=self.k, shards=shards)
+        query_vector, cached = None, None
+        if docs is None:
+            # Reuse a cached answer for the same or a near-identical question
+            query_vector = self.embeddings.embed_query(question)
+            cached = self.answer_cache.lookup_semantic(self.namespace, query_vector)
+            if cached is None:
+                docs = self.retriever.search(question, k=self.k, shards=shards, query_vector=query_vector)
+            else:
+                info["cache"] = "semantic"
+        else:
+            info["lexical"] = True
+        if cached is None:
+            cached = self.answer_cache.lookup_exact(self.namespace, question, docs)
+            if cached is not None:
+                info["cache"] = "exact"
+        return docs, query_vector, cached, info
+
+    def generate(self, question, docs, on_token=None):
+        """Answer from the retrieved chunks, calling on_token with each piece of text as it arrives"""
+        # Merge overlapping chunks and fill the prompt up to the token budget
+        context_docs, _ = pack_context(docs, max_tokens=self.context_tokens)
+        if on_token is None and self.chain is not None:
+            result = self.chain.invoke({"input_documents": context_docs, "question": question})
+            return result.get("output_text") or self.fallback
+        parts = []
+        for token in stream_answer(self.llm, context_docs, question):
+            parts.append(token)
+            if on_token is not None:
+                on_token(token)
+        return "".join(parts) or self.fallback
+
+    def speak(self, text):
+        """Speech audio for text in tts_engine.format"""
+        return synthesize_speech(text, lang="en", engine=self.tts_engine, cache=self.audio_cache)
+
+    def answer(self, question, speak=True, on_token=None, timer=None):
+        """Answer a question, returning a dict with the answer, its sources, audio and how it was found
+
+        Concurrent identical questions share one retrieval, LLM and TTS run;
+        "shared" is True for the callers that joined one already in flight,
+        whose on_token gets the whole answer at once. "metrics" has the
+        stage timings and counts of this call.
+        """
+        timer = (timer or StageTimer()).activate()
+        result, shared = shared_single_flight("answer").do(
+            question_key(self.namespace, question, speak), lambda: self._answer(question, speak, on_token, timer)
+        )
+        if shared and on_token is not None:
+            on_token(result["answer"])
+        timer.mark("answer")
+        return {**result, "question": question, "shared": shared, "metrics": request_record(timer)}
+
+    def _answer(self, question, speak, on_token, timer):
+        with timer.stage("retrieval"):
+            docs, query_vector, cached, info = self.retrieve(question)
+        if cached is not None:
+            answer, audio = cached["answer"], cached["audio"]
+            if speak and audio is None:
+                with timer.stage("speech"):
+                    audio = self.speak(answer)
+        else:
+            with timer.stage("answer"):
+                answer = self.generate(question, docs, on_token)
+            timer.mark("text")
+            audio = None
+            if speak:
+                with timer.stage("speech"):
+                    audio = self.speak(answer)
+            self.answer_cache.put(self.namespace, question, docs, query_vector, answer, audio)
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": sorted({doc.metadata.get("source", "") for doc in docs or []} - {""}),
+            "audio": audio,
+            "audio_format": self.tts_engine.format,
+            "cached": cached is not None,
+            **info,
+        }
+
+    def transcribe(self, data):
+        """Return (question, report) for recorded audio bytes"""
+        return transcribe(data, engine=self.asr_engine)
+
+    def answer_audio(self, data, speak=True):
+        """Transcribe a spoken question and answer it"""
+        timer = StageTimer().activate()
+        with timer.stage("transcription"):
+            question, trimmed = self.transcribe(data)
+        result = self.answer(question, speak=speak, timer=timer)
+        result["trimmed"] = trimmed
+        return result
@@ -0,0 +1,139 @@
+from collections.abc import Sequence
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+from voicera_core.metrics import span
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+# The lexical fast path needs the best hit to beat the runner-up by this factor
+FAST_PATH_MARGIN = 1.5
+CANDIDATES = 10
+
+
+class BM25Index:
+    """Okapi BM25 over chunk Documents, built on a scikit-learn CountVectorizer
+
+    Digits are kept as terms so lookups like "chapter 5" or "unit 3" match.
+    """
+
+    def __init__(self, docs, k1=BM25_K1, b=BM25_B):
+        # Sequences (like a memory-mapped chunk store) are kept as they are
+        self.docs = docs if isinstance(docs, Sequence) else list(docs)
+        self.vectorizer = CountVectorizer(token_pattern=r"(?u)\b\w+\b", stop_words="english")
+        self.analyzer = self.vectorizer.build_analyzer()
+        self.sources = np.array([doc.metadata.get("source", "") for doc in self.docs], dtype=object)
+        try:
+            tf = self.vectorizer.fit_transform(doc.page_content for doc in self.docs).tocsr().astype(np.float32)
+        except ValueError:
+            # No documents, or nothing but stop words
+            self.weights = None
+            return
+
+        n_docs = tf.shape[0]
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        norm = k1 * (1 - b + b * lengths / (lengths.mean() or 1.0))
+        rows = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        # Precompute every term's BM25 weight, a query then only sums columns
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm[rows])
+        self.weights = tf.tocsc()
+
+    @classmethod
+    def from_store(cls, docsearch, **kwargs):
+        """Index every Document in a langchain FAISS store"""
+        return cls(list(docsearch.docstore._dict.values()) if docsearch is not None else [], **kwargs)
+
+    def _terms(self, query):
+        words = set(self.analyzer(query))
+        vocabulary = self.vectorizer.vocabulary_
+        return words, [vocabulary[w] for w in words if w in vocabulary]
+
+    def _scores(self, query, sources=None):
+        if self.weights is None:
+            return set(), [], None
+        words, terms = self._terms(query)
+        if not terms:
+            return words, terms, None
+        scores = np.asarray(self.weights[:, terms].sum(axis=1)).ravel()
+        if sources is not None:
+            scores[~np.isin(self.sources, list(sources))] = 0.0
+        return words, terms, scores
+
+    def search(self, query, k=4, sources=None):
+        """Return up to k (Document, score) pairs, best first, optionally only from the given sources"""
+        _, _, scores = self._scores(query, sources)
+        if scores is None:
+            return []
+        order = np.argsort(-scores)[:k]
+        return [(self.docs[i], float(scores[i])) for i in order if scores[i] > 0]
+
+    def confident_search(self, query, k=4, sources=None, margin=FAST_PATH_MARGIN):
+        """Return the top k Documents if the lexical match is unambiguous, else None
+
+        The match is unambiguous when the best chunk contains every query
+        term and scores at least margin times the runner-up.
+        """
+        words, terms, scores = self._scores(query, sources)
+        if scores is None or len(terms) < len(words):
+            return None
+        order = np.argsort(-scores)[:max(k, 2)]
+        best = order[0]
+        if scores[best] <= 0 or self.weights[best, terms].count_nonzero() < len(terms):
+            return None
+        if len(order) > 1 and scores[best] < margin * scores[order[1]]:
+            return None
+        return [self.docs[i] for i in order[:k] if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(result_lists, k=4, rrf_k=RRF_K):
+    """Merge ranked lists of Documents, scoring each by the sum of 1 / (rrf_k + rank)"""
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, 1):
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+class HybridRetriever:
+    """BM25 plus vector search, fused with reciprocal rank fusion
+
+    vector_store is anything with similarity_search and
+    similarity_search_by_vector, a ShardedIndex also receives the shards to
+    search. fast_path lets keyword lookups skip the query embedding when the
+    lexical match is unambiguous.
+    """
+
+    def __init__(self, vector_store, lexical, fast_path=True, candidates=CANDIDATES):
+        self.vector_store = vector_store
+        self.lexical = lexical
+        self.fast_path_enabled = fast_path
+        self.candidates = candidates
+
+    def fast_path(self, query, k=4, shards=None):
+        """Documents from the lexical index alone, or None when vector search is needed"""
+        if not self.fast_path_enabled:
+            return None
+        with span("lexical_search"):
+            return self.lexical.confident_search(query, k, sources=shards)
+
+    def search(self, query, k=4, shards=None, query_vector=None):
+        """Fuse the top lexical and vector hits into k Documents
+
+        Pass query_vector when the query is already embedded, so it is not
+        embedded a second time.
+        """
+        kwargs = {"shards": shards} if shards is not None else {}
+        with span("vector_search"):
+            if query_vector is None:
+                vector_docs = self.vector_store.similarity_search(query, k=max(k, self.candidates), **kwargs)
+            else:
+                vector_docs = self.vector_store.similarity_search_by_vector(query_vector, k=max(k, self.candidates), **kwargs)
+        with span("lexical_search"):
+            lexical_docs = [doc for doc, _ in self.lexical.search(query, max(k, self.candidates), sources=shards)]
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k)
@@ -0,0 +1,166 @@
+from collections import deque
+from itertools import groupby
+
+from voicera_core.ann import MIN_TRAIN_VECTORS, make_store, needs_training
+from voicera_core.embedding_executor import BatchedEmbeddings
+from voicera_core.pdf_extract import iter_pages
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+EMBED_BATCH_SIZE = 64
+
+
+class Chunker:
+    """Splits page texts into chunks as they arrive, keeping the unfinished last chunk between calls
+
+    feed() can be called again with later pages of the same document and
+    continues exactly where the splitter would, overlap included. tail() is
+    the last chunk so far, which later pages may still extend; finish()
+    yields it once the document is complete.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separator="\n"):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+        self.current = deque()
+        self.total = 0
+
+    def tail(self):
+        return self.separator.join(self.current).strip() or None
+
+    def feed(self, pages):
+        """Yield the chunks completed by pages"""
+        separator_len = len(self.separator)
+        current = self.current
+        for page in pages:
+            if not page:
+                continue
+            for split in (page.strip() + "\n").split(self.separator):
+                if split == "":
+                    continue
+                length = len(split)
+                if self.total + length + (separator_len if current else 0) > self.chunk_size and current:
+                    doc = self.tail()
+                    if doc is not None:
+                        yield doc
+                    while self.total > self.chunk_overlap or (
+                        self.total + length + (separator_len if current else 0) > self.chunk_size and self.total > 0
+                    ):
+                        self.total -= len(current[0]) + (separator_len if len(current) > 1 else 0)
+                        current.popleft()
+                current.append(split)
+                self.total += length + (separator_len if len(current) > 1 else 0)
+
+    def finish(self):
+        """Yield the last chunk"""
+        doc = self.tail()
+        if doc is not None:
+            yield doc
+
+
+def iter_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separator="\n"):
+    """Yield chunks from page texts as they arrive
+
+    Produces exactly what CharacterTextSplitter(separator, chunk_size,
+    chunk_overlap).split_text(join_pages(pages)) would, so chunks still
+    span page breaks, but only holds about one chunk of text at a time.
+    """
+    chunker = Chunker(chunk_size, chunk_overlap, separator)
+    yield from chunker.feed(pages)
+    yield from chunker.finish()
+
+
+def embed_batch_size(embeddings, default=EMBED_BATCH_SIZE):
+    """Chunks to hand embeddings per call: enough to keep every worker of a BatchedEmbeddings busy"""
+    while embeddings is not None:
+        if isinstance(embeddings, BatchedEmbeddings):
+            return embeddings.batch_size * embeddings.max_concurrency
+        embeddings = getattr(embeddings, "embeddings", None)
+    return default
+
+
+def index_chunks(chunks, embeddings, docsearch=None, batch_size=None,
+                 metadata=None, id_prefix=None, on_batch=None, index_kind="flat"):
+    """Embed chunks one batch at a time and add each batch to docsearch
+
+    A new FAISS store of index_kind is created if docsearch is None. Kinds
+    that need training hold back at most MIN_TRAIN_VECTORS vectors to train
+    on before the store exists. batch_size defaults to embed_batch_size().
+    on_batch(texts) is called after every batch is embedded. Returns
+    (docsearch, chunk count).
+    """
+    batch_size = batch_size or embed_batch_size(embeddings)
+    count = 0
+    batch = []
+    pending_pairs, pending_metadatas, pending_ids = [], [], []
+
+    def create():
+        nonlocal docsearch
+        docsearch = make_store(
+            index_kind, pending_pairs, embeddings, metadatas=pending_metadatas,
+            ids=pending_ids if id_prefix else None
+        )
+        pending_pairs.clear()
+        pending_metadatas.clear()
+        pending_ids.clear()
+
+    def flush():
+        vectors = embeddings.embed_documents(batch)
+        metadatas = [dict(metadata or {}) for _ in batch]
+        ids = [f"{id_prefix}#{count - len(batch) + i}" for i in range(len(batch))] if id_prefix else None
+        pairs = list(zip(batch, vectors))
+        if docsearch is None:
+            pending_pairs.extend(pairs)
+            pending_metadatas.extend(metadatas)
+            pending_ids.extend(ids or [])
+            if not needs_training(index_kind) or len(pending_pairs) >= MIN_TRAIN_VECTORS:
+                create()
+        else:
+            docsearch.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+        if on_batch:
+            on_batch(batch)
+
+    for chunk in chunks:
+        batch.append(chunk)
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    if pending_pairs:
+        # Fewer vectors than a trained index needs, make_store falls back to flat
+        create()
+    return docsearch, count
+
+
+def ingest_files(sources, embeddings, names=None, docsearch=None, max_pages=None, first_page=0,
+                 chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, on_page=None, on_batch=None,
+                 index_kind="flat"):
+    """Stream PDFs page by page into a FAISS store: page, chunk, embed batch, index add
+
+    Each source is chunked separately and its chunks are tagged with its
+    name as "source" metadata and "<name>#<n>" ids ("<name>@<first_page>#<n>"
+    when starting part way through). on_page(index, text) sees every
+    extracted page. index_kind picks the FAISS index a new store is built
+    on (see voicera_core.ann). Returns (docsearch, {name: chunk count}).
+    """
+    sources = list(sources)
+    names = list(names) if names is not None else [str(i) for i in range(len(sources))]
+    counts = {name: 0 for name in names}
+
+    def pages():
+        for i, text in iter_pages(sources, max_pages=max_pages, first_page=first_page):
+            if on_page:
+                on_page(i, text)
+            yield i, text
+
+    for i, group in groupby(pages(), key=lambda item: item[0]):
+        chunks = iter_chunks((text for _, text in group), chunk_size, chunk_overlap)
+        id_prefix = names[i] if not first_page else f"{names[i]}@{first_page}"
+        docsearch, counts[names[i]] = index_chunks(
+            chunks, embeddings, docsearch, metadata={"source": names[i]}, id_prefix=id_prefix,
+            on_batch=on_batch, index_kind=index_kind
+        )
+    return docsearch, counts
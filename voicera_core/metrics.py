@@ -0,0 +1,335 @@
+"""Process-wide counters and stage latencies, exported as Prometheus text or JSON lines
+
+Stages are timed with span(), provider calls, tokens, embedded chunks and
+cache hits are counted with count(). Both are also recorded in the
+StageTimer active in the current context, so one question's numbers can be
+shown next to its answer. Worker pools doing part of a question's work
+(embedding batches, speech synthesis, API calls) run it in a copy of the
+submitting context, so their spans land in the same timer.
+"""
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from voicera_core.embedding_executor import estimate_tokens
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JSONL_ENV = "VOICERA_METRICS_JSONL"
+HELP = {
+    "voicera_stage_seconds": "Time spent in each stage of answering a question",
+    "voicera_provider_calls_total": "Calls to the embedding, LLM, speech recognition and TTS providers",
+    "voicera_provider_errors_total": "Provider calls that failed",
+    "voicera_llm_tokens_total": "Prompt and completion tokens of LLM calls (estimated when the provider does not say)",
+    "voicera_embedded_chunks_total": "Texts sent to the embedding provider",
+    "voicera_cache_hits_total": "Cache lookups that found an entry",
+    "voicera_cache_misses_total": "Cache lookups that did not",
+    "voicera_context_tokens_saved_total": "Prompt tokens removed by merging and deduplicating retrieved chunks",
+    "voicera_single_flight_total": "Requests that ran a computation (leader) or joined one already in flight (coalesced)",
+}
+
+_shared = None
+_shared_lock = Lock()
+_current = ContextVar("voicera_timer", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def short_name(name, labels):
+    """Compact name for display, e.g. provider_calls cohere/llm"""
+    name = name.removeprefix("voicera_").removesuffix("_total")
+    return f"{name} {'/'.join(str(v) for _, v in sorted(labels.items()))}" if labels else name
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms keyed by name and labels"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self._lock = Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            bucket = bisect_left(self.buckets, seconds)
+            if bucket < len(self.buckets):
+                histogram["buckets"][bucket] += 1
+
+    def snapshot(self):
+        """Counters and histogram counts/sums as plain data, for JSON"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h["count"], "sum": h["sum"]}
+                    for (name, labels), h in sorted(self.histograms.items())
+                ],
+            }
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines, described = [], set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, "counter")
+                lines.append(f"{name}{_label_text(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                describe(name, "histogram")
+                cumulative = 0
+                for bound, n in zip(self.buckets, h["buckets"]):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{name}_sum{_label_text(labels)} {h['sum']}")
+                lines.append(f"{name}_count{_label_text(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def shared_metrics():
+    """Return the Metrics shared by every session in this process"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Metrics()
+        return _shared
+
+
+def current_timer():
+    """The StageTimer recording in this context, if any"""
+    return _current.get()
+
+
+@contextmanager
+def activated(timer):
+    """Record spans and counts in this context in timer for the duration of the block"""
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def activate(timer):
+    """Record spans and counts in this context in timer from now on"""
+    _current.set(timer)
+    return timer
+
+
+def observe(stage, seconds):
+    shared_metrics().observe("voicera_stage_seconds", seconds, stage=stage)
+    timer = _current.get()
+    if timer is not None:
+        timer.record_span(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    """Time the block as stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def count(name, value=1, **labels):
+    """Add value to the counter name with labels"""
+    if not value:
+        return
+    shared_metrics().inc(name, value, **labels)
+    timer = _current.get()
+    if timer is not None:
+        timer.count(short_name(name, labels), value)
+
+
+def cache_lookup(cache, hits, misses=0):
+    """Count hits and misses of the cache called cache"""
+    count("voicera_cache_hits_total", hits, cache=cache)
+    count("voicera_cache_misses_total", misses, cache=cache)
+
+
+def _usage(response):
+    """(prompt, completion) tokens reported by the provider, None where it did not say"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """LangChain callback that times LLM calls and counts them and their tokens"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._runs = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._runs[run_id] = (time.perf_counter(), sum(estimate_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = sum(estimate_tokens(str(m.content)) for batch in messages for m in batch)
+        self._runs[run_id] = (time.perf_counter(), prompt)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, estimated_prompt = self._runs.pop(run_id, (None, 0))
+        if start is not None:
+            observe("llm", time.perf_counter() - start)
+        prompt, completion = _usage(response)
+        if prompt is None:
+            prompt = estimated_prompt
+        if completion is None:
+            completion = sum(estimate_tokens(g.text) for generations in response.generations for g in generations)
+        count("voicera_provider_calls_total", provider=self.provider, kind="llm")
+        count("voicera_llm_tokens_total", prompt, provider=self.provider, type="prompt")
+        count("voicera_llm_tokens_total", completion, provider=self.provider, type="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+        count("voicera_provider_calls_total", provider=self.provider, kind="llm")
+        count("voicera_provider_errors_total", provider=self.provider, kind="llm")
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """Embeddings wrapper that times and counts the calls reaching the provider
+
+    Goes innermost, e.g. CachedEmbeddings(BatchedEmbeddings(InstrumentedEmbeddings(provider))),
+    so cache hits are not counted as calls and every retry is.
+    """
+
+    def __init__(self, embeddings, provider):
+        self.embeddings = embeddings
+        self.provider = provider
+
+    @property
+    def model(self):
+        return getattr(self.embeddings, "model", "")
+
+    def _call(self, kind, fn, arg, texts):
+        count("voicera_provider_calls_total", provider=self.provider, kind=kind)
+        try:
+            with span(kind):
+                result = fn(arg)
+        except Exception:
+            count("voicera_provider_errors_total", provider=self.provider, kind=kind)
+            raise
+        count("voicera_embedded_chunks_total", texts, provider=self.provider)
+        return result
+
+    def embed_documents(self, texts):
+        return self._call("embed", self.embeddings.embed_documents, texts, len(texts))
+
+    def embed_query(self, text):
+        return self._call("embed_query", self.embeddings.embed_query, text, 1)
+
+
+def request_record(timer, **fields):
+    """One question's stages, spans and counts as a JSON-ready dict"""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **fields,
+        "stages": {name: round(seconds, 4) for name, seconds in timer.stages.items()},
+        "spans": {name: round(seconds, 4) for name, seconds in timer.spans.items()},
+        "marks": {name: round(seconds, 4) for name, seconds in timer.marks.items()},
+        "counts": dict(timer.counts),
+    }
+
+
+def write_jsonl(record, path=None):
+    """Append record as one JSON line to path, or to $VOICERA_METRICS_JSONL; nothing happens without either"""
+    path = path or os.environ.get(JSONL_ENV)
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = shared_metrics().prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(shared_metrics().snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) and /metrics.json from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    Thread(target=server.serve_forever, name="voicera-metrics", daemon=True).start()
+    return server
+
+
+def debug_panel(timer):
+    """Show one question's stage timings and counts, and the process totals, in Streamlit"""
+    import streamlit as st
+
+    st.subheader("🛠️ Debug metrics")
+    timings = {**timer.stages, **timer.spans}
+    if timings:
+        st.caption("This question")
+        st.table({"stage": list(timings), "ms": [round(s * 1000, 1) for s in timings.values()]})
+    if timer.counts:
+        st.table({"count": list(timer.counts), "value": list(timer.counts.values())})
+    if not timings and not timer.counts:
+        st.caption("Ask a question to see its timings.")
+    metrics = shared_metrics()
+    with st.expander("Process totals"):
+        snapshot = metrics.snapshot()
+        st.table({
+            "metric": [short_name(c["name"], c["labels"]) for c in snapshot["counters"]],
+            "value": [c["value"] for c in snapshot["counters"]],
+        })
+    st.download_button("Download Prometheus metrics", metrics.prometheus(), file_name="voicera.prom")
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from PyPDF2 import PdfReader
+
+PAGES_PER_TASK = 8
+
+_pool = None
+_pool_lock = Lock()
+
+
+def _open(source):
+    """Open a PDF given a path or the raw file bytes"""
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(BytesIO(source))
+    return PdfReader(source)
+
+
+def _extract_range(source, start, stop):
+    """Extract the text of pages [start, stop) of one PDF"""
+    reader = _open(source)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _get_pool(max_workers=None):
+    """Return the process pool shared by every extraction in this process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver avoids forking the threaded Streamlit server process
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=context)
+        return _pool
+
+
+def page_count(source, max_pages=None):
+    """Number of pages to extract from a PDF, capped at max_pages"""
+    count = len(_open(source).pages)
+    return count if max_pages is None else min(count, max_pages)
+
+
+def extract_pages_serial(sources, max_pages=None):
+    """Extract page texts one page at a time, returning one list per source"""
+    return [_extract_range(source, 0, page_count(source, max_pages)) for source in sources]
+
+
+def _tasks(sources, first_page, max_pages, pages_per_task):
+    """Yield (source index, source, start, stop) page ranges in document order"""
+    for i, source in enumerate(sources):
+        count = page_count(source, max_pages)
+        for start in range(first_page, count, pages_per_task):
+            yield i, source, start, min(start + pages_per_task, count)
+
+
+def iter_pages(sources, max_pages=None, pages_per_task=PAGES_PER_TASK, max_workers=None, max_in_flight=None,
+               first_page=0):
+    """Yield (source index, page text) for every page, in order, extracting across a process pool
+
+    Each source is a file path or the PDF's bytes. Pages are split into
+    ranges of pages_per_task so one large PDF is spread across cores too.
+    At most max_in_flight ranges are queued at once, so memory stays
+    bounded however many pages there are. Pages before first_page are
+    skipped.
+    """
+    sources = list(sources)
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1:
+        for i, source in enumerate(sources):
+            reader = _open(source)
+            for page in range(first_page, page_count(source, max_pages)):
+                yield i, reader.pages[page].extract_text() or ""
+        return
+
+    pool = _get_pool(max_workers)
+    in_flight = deque()
+    for i, source, start, stop in _tasks(sources, first_page, max_pages, pages_per_task):
+        in_flight.append((i, pool.submit(_extract_range, source, start, stop)))
+        if len(in_flight) >= (max_in_flight or 2 * workers):
+            j, future = in_flight.popleft()
+            for text in future.result():
+                yield j, text
+    while in_flight:
+        j, future = in_flight.popleft()
+        for text in future.result():
+            yield j, text
+
+
+def extract_pages(sources, max_pages=None, pages_per_task=PAGES_PER_TASK, max_workers=None):
+    """Extract page texts across a process pool, returning one list per source in page order"""
+    sources = list(sources)
+    results = [[] for _ in sources]
+    for i, text in iter_pages(sources, max_pages, pages_per_task, max_workers):
+        results[i].append(text)
+    return results
+
+
+def join_pages(pages):
+    """Join page texts the way the apps build doc_text"""
+    return "".join(text.strip() + "\n" for text in pages if text)
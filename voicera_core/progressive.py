@@ -0,0 +1,133 @@
+import hashlib
+from threading import Lock, Thread
+
+from langchain_community.vectorstores import FAISS
+
+from voicera_core.ingest import Chunker, index_chunks
+from voicera_core.pdf_extract import iter_pages, join_pages, page_count
+
+FIRST_PAGES = 20
+
+
+class LiveIndex:
+    """FAISS store that can be searched while a background worker keeps adding to it"""
+
+    def __init__(self, embeddings, docsearch=None):
+        self.embeddings = embeddings
+        self.docsearch = docsearch
+        self._lock = Lock()
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None):
+        text_embeddings = list(text_embeddings)
+        with self._lock:
+            if self.docsearch is None:
+                self.docsearch = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+                return ids
+            return self.docsearch.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids):
+        with self._lock:
+            self.docsearch.delete(ids)
+
+    def documents(self):
+        """Snapshot of the Documents indexed so far"""
+        with self._lock:
+            return list(self.docsearch.docstore._dict.values()) if self.docsearch is not None else []
+
+    def similarity_search(self, query, k=4, **kwargs):
+        # Embed outside the lock so searches only wait for the FAISS add itself
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        with self._lock:
+            if self.docsearch is None:
+                return []
+            return self.docsearch.similarity_search_by_vector(embedding, k, **kwargs)
+
+
+class ProgressiveIndexer:
+    """Index the first pages of a PDF right away and the rest in a background thread
+
+    Both passes share one Chunker, so the chunks end up exactly as if the
+    whole PDF had been split at once. The last chunk of the first pages is
+    indexed provisionally and replaced once the background pass has
+    extended it across the page boundary.
+    """
+
+    def __init__(self, file_bytes, name, embeddings, first_pages=FIRST_PAGES):
+        self.name = name
+        self.doc_id = hashlib.sha256(file_bytes).hexdigest()[:16]
+        self.total_pages = page_count(file_bytes)
+        self.first_pages = min(first_pages, self.total_pages)
+        self.pages = []
+        self.sections = 0
+        self.error = None
+        self.done = False
+        self.index = LiveIndex(embeddings)
+        self._chunker = Chunker()
+        self._provisional_id = None
+
+        finished = self.first_pages >= self.total_pages
+        self._ingest(file_bytes, embeddings, 0, self.first_pages, finished)
+        if not finished:
+            Thread(target=self._run, args=(file_bytes, embeddings), daemon=True).start()
+        else:
+            self.done = True
+
+    def _ingest(self, file_bytes, embeddings, first_page, max_pages, finished):
+        """Index the pages from first_page, the last chunk provisionally unless they finish the document"""
+        tail = []
+
+        def pages():
+            for _, text in iter_pages([file_bytes], max_pages=max_pages, first_page=first_page):
+                self.pages.append(text)
+                yield text
+
+        def chunks():
+            yield from self._chunker.feed(pages())
+            if finished:
+                yield from self._chunker.finish()
+            elif self._chunker.tail() is not None:
+                tail.append(self._chunker.tail())
+                yield tail[0]
+
+        id_prefix = self.name if not first_page else f"{self.name}@{first_page}"
+        _, count = index_chunks(
+            chunks(), embeddings, self.index, metadata={"source": self.name}, id_prefix=id_prefix,
+            on_batch=self._on_batch
+        )
+        if tail:
+            self._provisional_id = f"{id_prefix}#{count - 1}"
+
+    def _on_batch(self, texts):
+        self.sections += len(texts)
+        if self._provisional_id is not None:
+            # The background pass has indexed the chunk that extends the provisional one
+            self.index.delete([self._provisional_id])
+            self.sections -= 1
+            self._provisional_id = None
+
+    def _run(self, file_bytes, embeddings):
+        try:
+            self._ingest(file_bytes, embeddings, self.first_pages, None, True)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    @property
+    def version(self):
+        """Changes every time more of the document is indexed"""
+        return f"{self.doc_id}:{self.sections}"
+
+    @property
+    def pages_done(self):
+        return len(self.pages)
+
+    @property
+    def progress(self):
+        return self.pages_done / self.total_pages if self.total_pages else 1.0
+
+    @property
+    def doc_text(self):
+        return join_pages(list(self.pages))
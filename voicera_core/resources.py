@@ -0,0 +1,161 @@
+import os
+from threading import Lock
+from types import SimpleNamespace
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain_cohere import ChatCohere, CohereEmbeddings
+from langchain_community.llms import Cohere
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+from voicera_core.asr import get_asr_engine
+from voicera_core.context import MAX_CONTEXT_TOKENS
+from voicera_core.embedding_cache import CachedEmbeddings
+from voicera_core.embedding_executor import BatchedEmbeddings
+from voicera_core.engine import VoiceraEngine
+from voicera_core.hybrid import HybridRetriever
+from voicera_core.metrics import InstrumentedEmbeddings, LLMMetrics
+from voicera_core.standins import StandInASR, StandInChatModel, StandInEmbeddings, StandInTTS
+from voicera_core.syllabus_index import load_or_build_index
+from voicera_core.tts import get_tts_engine, shared_audio_cache
+
+SYLLABUS_FOLDER = "SSC_Syllabus"
+OFFLINE_INDEX_DIR = os.path.join(".voicera_cache", "offline_index")
+# Stand-in speech is kept apart from the real audio the apps cache
+OFFLINE_AUDIO_DIR = os.path.join(".voicera_cache", "offline_audio")
+
+_resources = {}
+_locks = {}
+_lock = Lock()
+
+
+def shared_resource(name, factory, version=None):
+    """Return the process-wide object called name, building it with factory only once
+
+    Concurrent callers wait for the one build instead of starting their own.
+    When version differs from the version the object was built for, it is
+    rebuilt and replaces the old one.
+    """
+    with _lock:
+        lock = _locks.setdefault(name, Lock())
+    with lock:
+        entry = _resources.get(name)
+        if entry is None or entry[0] != version:
+            entry = _resources[name] = (version, factory())
+        return entry[1]
+
+
+def folder_snapshot(folder, suffix=".pdf"):
+    """Name, size and modification time of each file, a cheap way to notice changes"""
+    return tuple(sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith(suffix)
+    ))
+
+
+def cohere_clients(api_key):
+    """Cohere embeddings, completion LLM, stuff QA chain and streaming chat model"""
+    def build():
+        callbacks = [LLMMetrics("cohere")]
+        llm = Cohere(cohere_api_key=api_key, temperature=0.3, callbacks=callbacks)
+        return SimpleNamespace(
+            embeddings=CachedEmbeddings(BatchedEmbeddings(InstrumentedEmbeddings(
+                CohereEmbeddings(cohere_api_key=api_key, model="embed-english-v3.0"), "cohere"
+            ))),
+            llm=llm,
+            chain=load_qa_chain(llm, chain_type="stuff"),
+            # The chat model streams tokens, the legacy completion model does not
+            chat_llm=ChatCohere(cohere_api_key=api_key, temperature=0.3, callbacks=callbacks),
+        )
+    return shared_resource(("cohere", api_key), build)
+
+
+def gemini_clients(api_key):
+    """Gemini embeddings, chat model and stuff QA chain"""
+    def build():
+        llm = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3, google_api_key=api_key,
+                                     callbacks=[LLMMetrics("gemini")])
+        return SimpleNamespace(
+            embeddings=CachedEmbeddings(BatchedEmbeddings(
+                InstrumentedEmbeddings(
+                    GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key), "gemini"
+                ),
+                batch_size=100
+            )),
+            llm=llm,
+            chain=load_qa_chain(llm, chain_type="stuff"),
+        )
+    return shared_resource(("gemini", api_key), build)
+
+
+def syllabus_resources(secrets, pdf_folder=SYLLABUS_FOLDER):
+    """Cohere clients plus the syllabus index and retriever, rebuilt when the PDFs change
+
+    secrets is st.secrets (or any mapping with the same keys), so the server
+    warm-up and the app agree on the settings.
+    """
+    clients = cohere_clients(secrets["cohere_api_key"])
+    index_kind = secrets.get("faiss_index", "flat")
+    fast_path = secrets.get("lexical_fast_path", True)
+
+    def build():
+        pdf_files = sorted(f for f in os.listdir(pdf_folder) if f.endswith(".pdf"))
+        if not pdf_files:
+            return SimpleNamespace(clients=clients, pdf_files=[], docsearch=None, retriever=None, texts=[], changes={})
+        # Reuse the saved index, embedding only PDFs that were added or changed
+        docsearch, texts, changes = load_or_build_index(
+            pdf_folder, pdf_files, clients.embeddings, embedding_model="cohere/embed-english-v3.0",
+            chunk_size=1000, chunk_overlap=200, index_kind=index_kind
+        )
+        return SimpleNamespace(
+            clients=clients,
+            pdf_files=pdf_files,
+            docsearch=docsearch,
+            retriever=HybridRetriever(docsearch, docsearch.lexical, fast_path=fast_path),
+            texts=texts,
+            changes=changes,
+        )
+    return shared_resource(("syllabus", pdf_folder, index_kind, fast_path), build, version=folder_snapshot(pdf_folder))
+
+
+def syllabus_engine(secrets, pdf_folder=SYLLABUS_FOLDER):
+    """VoiceraEngine over the shared syllabus resources, configured like voicera-ssc.py"""
+    resources = syllabus_resources(secrets, pdf_folder)
+    if resources.docsearch is None:
+        raise ValueError(f"No PDF files found in {pdf_folder}")
+    return VoiceraEngine(
+        resources.retriever, resources.clients.chat_llm, resources.clients.embeddings, resources.docsearch.version,
+        chain=resources.clients.chain,
+        tts_engine=get_tts_engine(secrets.get("tts_engine")),
+        asr_engine=get_asr_engine(secrets.get("asr_engine")),
+        context_tokens=secrets.get("context_tokens", MAX_CONTEXT_TOKENS),
+    )
+
+
+def offline_engine(pdf_folder=SYLLABUS_FOLDER, index_dir=OFFLINE_INDEX_DIR, embed_latency=0.0,
+                   first_token_latency=0.0, token_latency=0.0, tts_latency=0.0, asr_latency=0.0,
+                   answer_cache=None, audio_cache=None):
+    """VoiceraEngine over the syllabus with the local stand-in providers, usable without network
+
+    The latencies (in seconds) are simulated per provider call. Speech is
+    cached in OFFLINE_AUDIO_DIR unless audio_cache is given.
+    """
+    def build():
+        embeddings = InstrumentedEmbeddings(StandInEmbeddings(latency=embed_latency), "standin")
+        pdf_files = sorted(f for f in os.listdir(pdf_folder) if f.endswith(".pdf"))
+        docsearch, _, _ = load_or_build_index(pdf_folder, pdf_files, embeddings, embeddings.model, index_dir=index_dir)
+        return SimpleNamespace(
+            embeddings=embeddings,
+            docsearch=docsearch,
+            retriever=HybridRetriever(docsearch, docsearch.lexical),
+        )
+    resources = shared_resource(("offline", pdf_folder, index_dir, embed_latency), build, version=folder_snapshot(pdf_folder))
+    return VoiceraEngine(
+        resources.retriever,
+        StandInChatModel(first_token_latency=first_token_latency, token_latency=token_latency,
+                         callbacks=[LLMMetrics("standin")]),
+        resources.embeddings, resources.docsearch.version,
+        tts_engine=StandInTTS(latency=tts_latency),
+        asr_engine=StandInASR(latency=asr_latency),
+        answer_cache=answer_cache,
+        audio_cache=audio_cache if audio_cache is not None else shared_audio_cache(OFFLINE_AUDIO_DIR),
+    )
@@ -0,0 +1,66 @@
+"""Warm up the shared resources of a Voicera app, then serve it from the same process
+
+Usage: python -m voicera_core.serve voicera-ssc.py [streamlit run options]
+
+The app imports the same voicera_core modules, so the first student who
+connects finds the index, model clients, speech engines and caches ready.
+With VOICERA_METRICS_PORT set, the process metrics are served in the
+Prometheus format on that port at /metrics (and as JSON at /metrics.json).
+"""
+import os
+import sys
+import time
+
+import streamlit as st
+from streamlit.web import cli
+
+from voicera_core.answer_cache import shared_answer_cache
+from voicera_core.asr import get_asr_engine
+from voicera_core.embedding_cache import shared_cache
+from voicera_core.metrics import start_metrics_server
+from voicera_core.resources import cohere_clients, gemini_clients, syllabus_resources
+from voicera_core.tts import get_tts_engine, shared_audio_cache
+
+METRICS_PORT_ENV = "VOICERA_METRICS_PORT"
+
+WARMUPS = {
+    "voicera-ssc.py": lambda secrets: syllabus_resources(secrets),
+    "voicera-edu.py": lambda secrets: cohere_clients(secrets["cohere_api_key"]),
+    "voicera-app-gemini.py": lambda secrets: gemini_clients(secrets["gemini_api_key"]),
+}
+
+
+def warm_up(script):
+    """Build everything the app would otherwise build on its first request"""
+    start = time.perf_counter()
+    warm = WARMUPS.get(os.path.basename(script))
+    try:
+        if warm is not None:
+            warm(st.secrets)
+        get_tts_engine(st.secrets.get("tts_engine"))
+        get_asr_engine(st.secrets.get("asr_engine"))
+        shared_cache()
+        shared_audio_cache()
+        shared_answer_cache()
+    except Exception as e:
+        # Serve anyway, the app builds what is missing and reports the error itself
+        print(f"Warm-up of {script} failed: {str(e)}", flush=True)
+        return
+    print(f"Warmed up {script} in {time.perf_counter() - start:.1f}s", flush=True)
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().splitlines()[2])
+    script = sys.argv[1]
+    warm_up(script)
+    if os.environ.get(METRICS_PORT_ENV):
+        port = int(os.environ[METRICS_PORT_ENV])
+        start_metrics_server(port)
+        print(f"Serving metrics on port {port} at /metrics", flush=True)
+    sys.argv = ["streamlit", "run", *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import re
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+from voicera_core.chunk_store import SourceDocuments
+from voicera_core.hybrid import BM25Index
+
+MAX_SHARDS = 3
+MIN_SCORE = 0.05
+RELATIVE_SCORE = 0.5
+# Words in every syllabus file name, which say nothing about its subject
+GENERIC_NAME_WORDS = frozenset({"pdf", "syllabus", "maharashtra", "ssc", "sub"})
+
+
+def _words(text):
+    return re.findall(r"[a-z]{3,}", text.lower())
+
+
+def name_words(name):
+    """Subject words of a file name, e.g. {"maths"} for "Maharashtra SSC Maths Syllabus 2025_1747822518962.pdf"
+
+    Stop words ("and") and generic words are dropped, and so are tokens
+    containing digits, which are versions or hashes ("d4dfab13af").
+    """
+    tokens = re.split(r"[^a-z0-9]+", name.lower())
+    return {
+        t for t in tokens
+        if len(t) >= 3 and t.isalpha() and t not in ENGLISH_STOP_WORDS and t not in GENERIC_NAME_WORDS
+    }
+
+
+def _same_word(word, name_word):
+    """Prefix match, so math, maths and mathematics all hit the Maths shard"""
+    shared = len(os.path.commonprefix([word, name_word]))
+    return shared >= max(4, min(len(word), len(name_word)) - 1)
+
+
+class ShardRouter:
+    """Pick the shards worth searching for a query
+
+    Each shard is described by the TF-IDF vector of its chunk texts. A
+    query goes to the shards whose name it mentions (e.g. "maths" routes to
+    the Maths syllabus), otherwise to the shards closest to it by TF-IDF
+    cosine similarity. When no shard scores at least min_score the router is
+    unsure and every shard is searched.
+    """
+
+    def __init__(self, shard_texts, max_shards=MAX_SHARDS, min_score=MIN_SCORE, relative_score=RELATIVE_SCORE):
+        self.names = list(shard_texts)
+        self.max_shards = max_shards
+        self.min_score = min_score
+        self.relative_score = relative_score
+        self.name_words = {name: name_words(name) for name in self.names}
+        self.vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        documents = [name + "\n" + "\n".join(shard_texts[name]) for name in self.names]
+        self.matrix = self.vectorizer.fit_transform(documents) if any(d.strip() for d in documents) else None
+
+    def _named(self, query):
+        words = set(_words(query)) - ENGLISH_STOP_WORDS
+        return [
+            name for name in self.names
+            if any(_same_word(w, n) for w in words for n in self.name_words[name])
+        ]
+
+    def route(self, query):
+        """Return the names of the shards to search, most relevant first"""
+        named = self._named(query)
+        if named:
+            return named[:self.max_shards]
+        if self.matrix is None:
+            return list(self.names)
+        scores = (self.matrix @ self.vectorizer.transform([query]).T).toarray().ravel()
+        best = scores.max() if len(scores) else 0.0
+        if best < self.min_score:
+            return list(self.names)
+        order = np.argsort(-scores)[:self.max_shards]
+        return [self.names[i] for i in order if scores[i] >= best * self.relative_score]
+
+
+class ShardedIndex:
+    """Set of FAISS shards searched like a single vector store"""
+
+    def __init__(self, shards, embeddings, shard_texts, router=None, version=None):
+        self.shards = shards
+        self.embeddings = embeddings
+        self.router = router or ShardRouter(shard_texts)
+        # BM25 over the same chunks, each tagged with its shard as source
+        self.lexical = BM25Index(SourceDocuments({name: shard_texts[name] for name in shards}))
+        # Changes whenever a source file or the index settings change
+        self.version = version
+
+    def route(self, query):
+        return [name for name in self.router.route(query) if name in self.shards]
+
+    def similarity_search(self, query, k=4, shards=None, **kwargs):
+        """Search the routed shards (or the given ones) and merge the closest k chunks"""
+        names = shards if shards is not None else self.route(query)
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, shards=names, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, shards=None, **kwargs):
+        """Search the given shards (all of them by default) for the k chunks closest to an embedded query"""
+        names = shards if shards is not None else list(self.shards)
+        scored = []
+        for name in names:
+            scored.extend(self.shards[name].similarity_search_with_score_by_vector(embedding, k, **kwargs))
+        scored.sort(key=lambda item: item[1])
+
+        docs, seen = [], set()
+        for doc, _ in scored:
+            # Identical PDFs in different shards return the same chunk twice
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                docs.append(doc)
+        return docs[:k]
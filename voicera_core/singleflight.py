@@ -0,0 +1,118 @@
+from concurrent.futures import Future
+from threading import Lock
+
+from voicera_core.answer_cache import normalize_question
+from voicera_core.metrics import count
+
+_groups = {}
+_groups_lock = Lock()
+
+
+def question_key(namespace, question, *extra):
+    """Key under which identical questions against the same index version are coalesced"""
+    return (namespace, normalize_question(question)) + extra
+
+
+class SingleFlight:
+    """Runs one computation per key at a time, sharing its result with every concurrent caller of that key
+
+    Only callers that arrive while the computation is in flight share it;
+    the result is not kept afterwards (that is what the answer cache is for).
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+        self._calls = {}
+        self._lock = Lock()
+
+    def _join(self, key):
+        """Return (future, shared), registering a new in-flight call when there is none for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+        self._count(shared)
+        return future, shared
+
+    def _count(self, shared):
+        count("voicera_single_flight_total", group=self.name, result="coalesced" if shared else "leader")
+
+    def _finish(self, key, future, failed):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+            self.failures += failed
+
+    def do(self, key, fn):
+        """Return (fn(), shared), running fn here unless an identical call is already in flight
+
+        A caller that joined a call which was interrupted rather than failed
+        (e.g. a Streamlit rerun stopping the leading session) runs fn itself.
+        """
+        while True:
+            future, shared = self._join(key)
+            if not shared:
+                break
+            error = future.exception()
+            if error is None:
+                return future.result(), True
+            if isinstance(error, Exception):
+                raise error
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, isinstance(e, Exception))
+            future.set_exception(e)
+            raise
+        self._finish(key, future, False)
+        future.set_result(result)
+        return result, False
+
+    def submit(self, key, executor, fn):
+        """Return (future, shared) for fn on executor, reusing the future of an identical call in flight"""
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                future = self._calls[key] = executor.submit(fn)
+                self.leaders += 1
+        self._count(shared)
+        if not shared:
+            future.add_done_callback(lambda done: self._finish(key, done, done.cancelled() or done.exception() is not None))
+        return future, shared
+
+    def stats(self):
+        """Calls run, calls that joined one in flight, failures and calls running now"""
+        with self._lock:
+            calls = self.leaders + self.coalesced
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesce_rate": self.coalesced / calls if calls else 0.0,
+                "failures": self.failures,
+                "in_flight": len(self._calls),
+            }
+
+
+def shared_single_flight(name):
+    """Return the process-wide SingleFlight group called name, e.g. "answer" or "speech" """
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def single_flight_stats():
+    """stats() of every group by name"""
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.stats() for name, group in groups.items()}
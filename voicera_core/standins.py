@@ -0,0 +1,121 @@
+"""Deterministic local stand-ins for the embedding, LLM, ASR and TTS providers
+
+They make the pipeline runnable offline, in tests and load tests, with an
+optional simulated latency for every call.
+"""
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from voicera_core.asr import ASREngine
+from voicera_core.tts import TTSEngine, pcm_to_wav
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+class StandInEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: texts sharing words get similar vectors
+
+    latency is the simulated seconds per call plus per_text seconds for
+    each text in it.
+    """
+
+    def __init__(self, size=256, latency=0.0, per_text=0.0):
+        self.size = size
+        self.latency = latency
+        self.per_text = per_text
+        self.model = f"standin-{size}"
+        self.calls = 0
+
+    def _vector(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _words(text):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class StandInChatModel(BaseChatModel):
+    """Extractive chat model: answers with the context sentences sharing most words with the question
+
+    first_token_latency and token_latency simulate the time to the first
+    token and between tokens.
+    """
+
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    max_sentences: int = 2
+
+    @property
+    def _llm_type(self):
+        return "standin"
+
+    def _answer(self, messages):
+        if len(messages) > 1:
+            # Chat stuff prompt: context in the system message, question last
+            context, question = "\n".join(m.content for m in messages[:-1]), messages[-1].content
+        else:
+            context, _, question = (messages[0].content if messages else "").rpartition("Question:")
+        asked = set(_words(question))
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", context) if len(s.strip()) > 20]
+        ranked = sorted(sentences, key=lambda s: -len(asked & set(_words(s))))
+        return " ".join(ranked[:self.max_sentences]) or "I don't know."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for n, token in enumerate(re.findall(r"\S+\s*", self._answer(messages))):
+            if n:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class StandInTTS(TTSEngine):
+    """Silent WAV as long as the text would take to read, after latency seconds"""
+
+    name = "standin"
+    format = "audio/wav"
+
+    def __init__(self, latency=0.0, words_per_second=2.5, sample_rate=8000):
+        self.latency = latency
+        self.words_per_second = words_per_second
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text, lang="en", voice=""):
+        time.sleep(self.latency)
+        seconds = max(1, len(text.split())) / self.words_per_second
+        return pcm_to_wav(b"\0\0" * int(seconds * self.sample_rate), self.sample_rate)
+
+
+class StandInASR(ASREngine):
+    """Returns a fixed transcript after latency seconds"""
+
+    name = "standin"
+
+    def __init__(self, text="What is the weightage of each unit in the Science paper?", latency=0.0):
+        self.text = text
+        self.latency = latency
+
+    def transcribe(self, audio_data, lang="en-US"):
+        time.sleep(self.latency)
+        return self.text
@@ -0,0 +1,22 @@
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+
+def stuff_prompt(llm, docs, question):
+    """Build the prompt load_qa_chain(llm, chain_type="stuff") would send"""
+    prompt = PROMPT_SELECTOR.get_prompt(llm)
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return prompt.format_prompt(context=context, question=question)
+
+
+def stream_answer(llm, docs, question):
+    """Yield answer text as the LLM generates it
+
+    Uses the prompt the "stuff" QA chain would send to the same llm, so the
+    answer only matches the blocking one when both run on the same model.
+    Chat models yield message chunks and plain LLMs yield strings, so both
+    are reduced to text.
+    """
+    for chunk in llm.stream(stuff_prompt(llm, docs, question)):
+        text = chunk if isinstance(chunk, str) else chunk.content
+        if text:
+            yield text
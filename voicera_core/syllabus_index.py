@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import faiss
+
+from voicera_core.chunk_store import ChunkSlice, ChunkStore, load_shard, shard_store
+from voicera_core.ingest import ingest_files
+from voicera_core.shards import ShardedIndex
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no lock, so only run one process per index there
+    fcntl = None
+
+INDEX_DIR = ".voicera_index"
+SHARDS_DIR = "shards"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 4
+# PDFs chunked and embedded at once; BatchedEmbeddings still caps the provider calls
+BUILD_WORKERS = 4
+LOCK_FILE = ".lock"
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shard_dir(index_dir, pdf_file):
+    """Directory holding the FAISS shard of one PDF"""
+    return os.path.join(index_dir, SHARDS_DIR, hashlib.sha1(pdf_file.encode("utf-8")).hexdigest()[:16])
+
+
+def read_json(path):
+    """Return the parsed JSON file, or None if there is no usable one"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    """Write JSON through a temporary file so readers never see half of it"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def save_shard(path, docsearch):
+    """Write the vectors of one shard, replacing any previous copy (texts live in the chunk store)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    faiss.write_index(docsearch.index, os.path.join(tmp, "index.faiss"))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def index_lock(index_dir):
+    """Hold an exclusive lock on index_dir across processes
+
+    Replicas sharing one index directory check and update it one at a time,
+    so the others wait for the first one's build and then just load it.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def clear_index(index_dir):
+    """Delete everything in index_dir except the lock file"""
+    for entry in os.scandir(index_dir):
+        if entry.name == LOCK_FILE:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def open_chunks(index_dir, files, use_mmap=True):
+    """Open the chunk store and split it into {file: texts} by the per-file counts"""
+    store = ChunkStore(index_dir, use_mmap=use_mmap)
+    chunks, start = {}, 0
+    for f, count in files:
+        chunks[f] = ChunkSlice(store, start, start + count)
+        start += count
+    if start != len(store):
+        raise ValueError("Chunk store does not match the manifest")
+    return chunks
+
+
+def build_shard(pdf_folder, pdf_file, embeddings, chunk_size, chunk_overlap, index_kind):
+    """Stream one PDF into its own FAISS shard, returning (docsearch, chunk texts)"""
+    docsearch, counts = ingest_files(
+        [os.path.join(pdf_folder, pdf_file)], embeddings, names=[pdf_file],
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, index_kind=index_kind
+    )
+    if docsearch is None:
+        return None, []
+    return docsearch, [docsearch.docstore.search(f"{pdf_file}#{i}").page_content for i in range(counts[pdf_file])]
+
+
+def load_or_build_index(pdf_folder, pdf_files, embeddings, embedding_model,
+                        chunk_size=1000, chunk_overlap=200, index_kind="flat", index_dir=INDEX_DIR, use_mmap=True):
+    """Load the per-PDF shards and bring them up to date with the PDFs in pdf_folder
+
+    Every PDF has its own FAISS shard. Only PDFs that were added or changed
+    since the last run are embedded, and the shards of removed PDFs are
+    deleted. Everything is rebuilt only when the chunking, embedding or
+    index_kind settings change.
+
+    With use_mmap the saved vectors and chunk texts are memory-mapped
+    read-only, so server processes on one host share a single copy of them
+    in the page cache. Those processes may call this at the same time: the
+    check and any rebuild happen under a lock on index_dir.
+
+    Returns (docsearch, texts, changes) where docsearch is a ShardedIndex and
+    changes lists the "added", "changed" and "removed" files.
+    """
+    settings = {
+        "separator": "\n",
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model,
+        "index_kind": index_kind,
+    }
+    hashes = {f: file_sha256(os.path.join(pdf_folder, f)) for f in sorted(pdf_files)}
+    with index_lock(index_dir):
+        return _load_or_build(pdf_folder, hashes, settings, embeddings, index_dir, use_mmap)
+
+
+def _load_or_build(pdf_folder, hashes, settings, embeddings, index_dir, use_mmap):
+    """load_or_build_index with the lock held"""
+    chunk_size, chunk_overlap = settings["chunk_size"], settings["chunk_overlap"]
+    index_kind = settings["index_kind"]
+    saved, chunks = {}, {}
+    manifest = read_json(os.path.join(index_dir, MANIFEST_FILE))
+    if manifest and manifest.get("version") == MANIFEST_VERSION and manifest.get("settings") == settings:
+        try:
+            chunks = open_chunks(index_dir, [(f, entry["chunks"]) for f, entry in manifest["files"].items()], use_mmap)
+            saved = manifest["files"]
+        except (OSError, ValueError):
+            chunks = {}
+    if not saved:
+        clear_index(index_dir)
+
+    removed = [f for f, entry in saved.items() if hashes.get(f) != entry["sha256"]]
+    added = [f for f in hashes if f not in saved or f in removed]
+
+    indexes = {}
+    for f in hashes:
+        if f in added or not saved[f]["chunks"]:
+            continue
+        try:
+            indexes[f] = load_shard(shard_dir(index_dir, f), f, chunks[f], embeddings, index_kind, use_mmap).index
+        except Exception:
+            # Corrupt or missing shard, rebuild just this file
+            added.append(f)
+
+    for f in removed:
+        shutil.rmtree(shard_dir(index_dir, f), ignore_errors=True)
+        chunks.pop(f, None)
+
+    # Most syllabus PDFs fill less than one embedding batch, so they are built side by side
+    with ThreadPoolExecutor(max_workers=BUILD_WORKERS) as pool:
+        built = list(pool.map(
+            lambda f: build_shard(pdf_folder, f, embeddings, chunk_size, chunk_overlap, index_kind), added
+        ))
+    for f, (docsearch, chunks[f]) in zip(added, built):
+        if docsearch is not None:
+            save_shard(shard_dir(index_dir, f), docsearch)
+            indexes[f] = docsearch.index
+
+    if not indexes:
+        raise ValueError("No text could be extracted from the PDFs")
+
+    if added or removed:
+        ChunkStore.write(index_dir, (text for f in hashes for text in chunks[f]))
+        # Written last so a half-updated index never looks valid
+        write_json(os.path.join(index_dir, MANIFEST_FILE), {
+            "version": MANIFEST_VERSION,
+            "settings": settings,
+            "files": {f: {"sha256": hashes[f], "chunks": len(chunks[f])} for f in hashes},
+        })
+        chunks = open_chunks(index_dir, [(f, len(chunks[f])) for f in hashes], use_mmap)
+
+    shards = {f: shard_store(index, f, chunks[f], embeddings) for f, index in indexes.items()}
+    texts = ChunkStore(index_dir, use_mmap=use_mmap)
+    changes = {
+        "added": [f for f in added if f not in saved],
+        "changed": [f for f in removed if f in hashes],
+        "removed": [f for f in removed if f not in hashes],
+    }
+    version = hashlib.sha1(json.dumps([settings, hashes], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    docsearch = ShardedIndex(shards, embeddings, {f: chunks[f] for f in shards}, version=version)
+    return docsearch, texts, changes
@@ -0,0 +1,74 @@
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from voicera_core.metrics import activate, activated, shared_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Wall-clock seconds spent in each stage of answering a question, and when each result reached the user
+
+    Stages may run on other threads, e.g. speech synthesis on the worker pool.
+    While the timer is active in a context, the spans and counts recorded by
+    voicera_core.metrics there (embedding calls, vector search, LLM tokens,
+    cache hits...) are kept in spans and counts as well, including those
+    from worker pools that run in a copy of that context.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.spans = {}
+        self.counts = {}
+        self.marks = {}
+        self._lock = Lock()
+
+    def activate(self):
+        """Make this the timer of everything recorded in this context from now on"""
+        return activate(self)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with activated(self):
+                yield
+        finally:
+            seconds = time.perf_counter() - start
+            shared_metrics().observe("voicera_stage_seconds", seconds, stage=name)
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_span(self, name, seconds):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def mark(self, name):
+        """Record that a result (e.g. "text" or "audio") is now in front of the user"""
+        self.marks[name] = time.perf_counter() - self.started
+
+    def saved(self):
+        """Seconds the text answer arrived sooner than if it had waited for the speech"""
+        if "text" not in self.marks or "speech" not in self.stages:
+            return 0.0
+        return self.stages["speech"]
+
+    def summary(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.stages.items()]
+        if "text" in self.marks:
+            parts.append(f"text shown after {self.marks['text']:.2f}s")
+        if "audio" in self.marks:
+            parts.append(f"audio after {self.marks['audio']:.2f}s")
+        if self.saved() >= 0.01:
+            parts.append(f"{self.saved():.2f}s sooner than waiting for the audio")
+        return " · ".join(parts)
+
+    def log(self):
+        logger.info("Stage timings: %s", self.summary())
@@ -0,0 +1,282 @@
+import contextvars
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from threading import Lock
+
+from gtts import gTTS
+
+from voicera_core.metrics import cache_lookup, count, span
+from voicera_core.singleflight import shared_single_flight
+
+AUDIO_CACHE_DIR = os.path.join(".voicera_cache", "audio")
+MAX_CACHE_BYTES = 256 * 2 ** 20
+DEFAULT_ENGINE = "gtts"
+SPEECH_WORKERS = 4
+
+_shared = {}
+_shared_lock = Lock()
+_engines = {}
+_engines_lock = Lock()
+_executor = None
+_executor_lock = Lock()
+
+
+class AudioCache:
+    """Size-bounded LRU cache of synthesized speech on disk, keyed by content
+
+    The three apps run as separate processes sharing one cache directory,
+    so the bound applies to the directory as a whole: every put rescans it
+    and evicts the least recently used files, whichever process wrote them.
+    """
+
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text, engine, lang, voice=""):
+        return hashlib.sha256("\0".join([engine, lang, voice, text]).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached audio bytes, or None"""
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # The modification time doubles as the LRU timestamp
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store audio bytes and evict the least recently used files over max_bytes"""
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=key + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.cache_dir, key))
+        with self._lock:
+            files = self._scan()
+            total = sum(size for _, size, _ in files)
+            # Oldest modification time first, which get() refreshes on every hit
+            for name, size, _ in sorted(files, key=lambda f: f[2]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    # Another process evicted it first
+                    pass
+                total -= size
+
+    def _scan(self):
+        """(name, bytes, mtime) of every cached file, including those of the other processes"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((entry.name, stat.st_size, stat.st_mtime))
+        return files
+
+    def stats(self):
+        files = self._scan()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "files": len(files),
+                "bytes": sum(size for _, size, _ in files),
+            }
+
+
+def shared_audio_cache(cache_dir=AUDIO_CACHE_DIR):
+    """Return the AudioCache of cache_dir shared by every session in this process"""
+    with _shared_lock:
+        if cache_dir not in _shared:
+            _shared[cache_dir] = AudioCache(cache_dir)
+        return _shared[cache_dir]
+
+
+def gtts_synthesize(text, lang="en"):
+    """Synthesize speech with gTTS and return the MP3 bytes"""
+    buffer = BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+def pcm_to_wav(pcm, sample_rate, channels=1, sample_width=2):
+    """Wrap raw PCM samples in a WAV container"""
+    buffer = BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(sample_width)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class TTSEngine:
+    """Speech synthesis backend
+
+    Subclasses set name (also part of the audio cache key), format (the MIME
+    type of the audio they return) and implement synthesize.
+    """
+
+    name = None
+    format = None
+
+    def synthesize(self, text, lang="en", voice=""):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS, one network round trip per answer"""
+
+    name = "gtts"
+    format = "audio/mp3"
+
+    def synthesize(self, text, lang="en", voice=""):
+        return gtts_synthesize(text, lang)
+
+
+class EspeakEngine(TTSEngine):
+    """eSpeak NG running locally on the CPU, no network needed"""
+
+    name = "espeak"
+    format = "audio/wav"
+
+    def __init__(self, executable=None, words_per_minute=165):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.executable is None:
+            raise RuntimeError("espeak-ng is not installed")
+        self.words_per_minute = words_per_minute
+
+    def synthesize(self, text, lang="en", voice=""):
+        result = subprocess.run(
+            [self.executable, "--stdout", "-v", voice or lang, "-s", str(self.words_per_minute)],
+            input=text.encode("utf-8"), capture_output=True, check=True
+        )
+        return result.stdout
+
+
+class PiperEngine(TTSEngine):
+    """Piper neural voice running locally on the CPU
+
+    model is the path of a Piper .onnx voice; its .onnx.json config next to
+    it gives the sample rate. The voice argument is ignored, the model is
+    the voice.
+    """
+
+    name = "piper"
+    format = "audio/wav"
+
+    def __init__(self, model=None, executable=None):
+        self.model = model or os.environ.get("VOICERA_PIPER_MODEL")
+        self.executable = executable or shutil.which("piper")
+        if self.executable is None:
+            raise RuntimeError("piper is not installed")
+        if not self.model or not os.path.exists(self.model):
+            raise RuntimeError("Set VOICERA_PIPER_MODEL to the path of a Piper .onnx voice")
+        with open(self.model + ".json", encoding="utf-8") as f:
+            self.sample_rate = json.load(f)["audio"]["sample_rate"]
+        self.name = "piper:" + os.path.basename(self.model)
+
+    def synthesize(self, text, lang="en", voice=""):
+        result = subprocess.run(
+            [self.executable, "--model", self.model, "--output_raw"],
+            input=text.encode("utf-8"), capture_output=True, check=True
+        )
+        return pcm_to_wav(result.stdout, self.sample_rate)
+
+
+ENGINES = {
+    "gtts": GTTSEngine,
+    "espeak": EspeakEngine,
+    "piper": PiperEngine,
+}
+
+
+def get_tts_engine(name=None):
+    """Return the process-wide engine called name, or the one set by VOICERA_TTS_ENGINE"""
+    name = name or os.environ.get("VOICERA_TTS_ENGINE") or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine {name!r}, expected one of {', '.join(ENGINES)}")
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]()
+        return _engines[name]
+
+
+def synthesize_speech(text, lang="en", engine=None, voice="", cache=None):
+    """Return speech audio for text, synthesizing it only if it is not cached yet
+
+    engine is an engine name or TTSEngine, defaulting to get_tts_engine(),
+    and cache an AudioCache, defaulting to shared_audio_cache(). The audio
+    is in engine.format.
+    """
+    if not isinstance(engine, TTSEngine):
+        engine = get_tts_engine(engine)
+    if cache is None:
+        cache = shared_audio_cache()
+    key = cache.key(text, engine.name, lang, voice)
+    audio = cache.get(key)
+    cache_lookup("audio", int(audio is not None), int(audio is None))
+    if audio is None:
+        count("voicera_provider_calls_total", provider=engine.name, kind="tts")
+        with span("tts"):
+            audio = engine.synthesize(text, lang, voice)
+        cache.put(key, audio)
+    return audio
+
+
+def speech_executor():
+    """Process-wide worker pool that synthesizes speech off the answering path"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SPEECH_WORKERS, thread_name_prefix="voicera-tts")
+        return _executor
+
+
+def submit_speech(text, lang="en", engine=None, voice="", timer=None, cache=None):
+    """Start synthesize_speech on the worker pool and return its Future
+
+    Identical requests already being synthesized share that Future. The
+    time spent is recorded as the "speech" stage of timer, if given, and the
+    worker records its spans and counts in the caller's active timer.
+    """
+    if not isinstance(engine, TTSEngine):
+        engine = get_tts_engine(engine)
+
+    def run():
+        if timer is None:
+            return synthesize_speech(text, lang, engine, voice, cache)
+        with timer.stage("speech"):
+            return synthesize_speech(text, lang, engine, voice, cache)
+    key = AudioCache.key(text, engine.name, lang, voice)
+    future, _ = shared_single_flight("speech").submit(key, speech_executor(), partial(contextvars.copy_context().run, run))
+    return future